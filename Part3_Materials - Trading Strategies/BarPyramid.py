@@ -0,0 +1,89 @@
+import pandas as pd
+from DataCache import read_csv_cached, read_meta, write_cache, load_cache
+
+
+LEVELS = ["5min", "20min", "1h", "4h", "1D"] # each level is a multiple of the previous one
+
+# finest available data per symbol: (csv file, price column)
+SOURCES = {"EURUSD": ("five_minute.csv", "price"),
+           "EURUSD=X": ("five_minute.csv", "price")} # Yahoo ticker (forex_pairs.csv)
+
+
+class BarPyramid():
+    ''' Multi-timeframe OHLC bars (5m -> 20m -> 1h -> 4h -> 1D) built once from the finest data.
+
+    All levels are built in a single pass (each level is aggregated from the previous,
+    already aggregated level) and cached next to the source file (see DataCache).
+    Bars are labeled with their opening time (like the csv files) and aligned to the
+    FX trading day starting at 22:00 UTC (day_start).
+    '''
+
+    def __init__(self, filepath, column = "price", index_col = "time", levels = LEVELS, day_start = "22h"):
+        '''
+        Parameters
+        ----------
+        filepath: str
+            csv file with the finest data (e.g. five_minute.csv)
+        column: str
+            price column (close prices) in filepath
+        index_col: str
+            name of the datetime column
+        levels: list
+            bar lengths (pandas frequencies), finest first
+        day_start: str
+            offset (from midnight) at which 4h and daily bars start
+        '''
+        self.filepath = filepath
+        self.column = column
+        self.index_col = index_col
+        self.levels = levels
+        self.day_start = pd.to_timedelta(day_start)
+
+    def __repr__(self):
+        return "BarPyramid(filepath = {}, column = {}, levels = {})".format(self.filepath, self.column, self.levels)
+
+    def variant(self, bar_length):
+        ''' Returns the cache variant (see DataCache) of a level.
+        '''
+        return "{}@{}".format(self.column, bar_length)
+
+    def build(self):
+        ''' Builds (and caches) the OHLC bars of all levels in a single pass.
+        '''
+        raw = read_csv_cached(self.filepath, parse_dates = [self.index_col], index_col = self.index_col)
+        price = raw[self.column].dropna()
+        bars = pd.DataFrame({"open": price, "high": price, "low": price, "close": price})
+
+        pyramid = {}
+        for bar_length in self.levels:
+            # fixed-length rule (a Timedelta), so that day_start also applies to daily bars
+            bars = bars.resample(pd.to_timedelta(bar_length), label = "left", closed = "left", offset = self.day_start).agg(
+                {"open": "first", "high": "max", "low": "min", "close": "last"}).dropna()
+            pyramid[bar_length] = bars
+            try:
+                write_cache(self.filepath, bars, self.variant(bar_length))
+            except OSError: # e.g. read-only data directory -> work without cache
+                pass
+        return pyramid
+
+    def get(self, bar_length):
+        ''' Returns the OHLC bars of one level (from the cache, if up to date).
+        '''
+        if bar_length not in self.levels:
+            raise ValueError("bar_length must be one of {}".format(self.levels))
+        meta = read_meta(self.filepath, self.variant(bar_length), self.index_col)
+        if meta is not None:
+            bars = load_cache(self.filepath, meta, self.variant(bar_length))
+            if bars is not None:
+                return bars
+        return self.build()[bar_length]
+
+
+def get_bars(symbol, bar_length, start = None, end = None):
+    ''' Returns the close prices (column "price") of symbol for the given bar length between start and end.
+    '''
+    if symbol not in SOURCES:
+        raise ValueError("No bar data for {} (see BarPyramid.SOURCES).".format(symbol))
+    filepath, column = SOURCES[symbol]
+    bars = BarPyramid(filepath, column).get(bar_length)
+    return bars.loc[start:end, ["close"]].rename(columns = {"close": "price"})
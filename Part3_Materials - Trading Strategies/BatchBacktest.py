@@ -0,0 +1,161 @@
+import pandas as pd
+import numpy as np
+from PriceStore import PriceStore
+from DataCache import read_csv_window
+
+
+def price_matrix(filepath, symbols, start = None, end = None, index_col = "time", cache = True):
+    ''' Returns the prices of several symbols as (bars x symbols) DataFrame.
+
+    Each column holds the bars of its symbol between start and end (missing prices dropped,
+    like in get_data), starting in the first row and NaN-padded at the end. Rolling windows
+    over a column therefore run over the symbol's own bars, exactly like in test_strategy.
+    The PriceStore is opened once for all symbols. With cache = False, or if the cache can't
+    be written, the csv file is streamed per symbol instead (see PriceStore.read_prices).
+    '''
+    store = None
+    if cache:
+        try:
+            store = PriceStore(filepath, index_col = index_col)
+        except OSError: # e.g. read-only data directory -> stream the csv file
+            pass
+    frames = [store.get(symbol, start, end) if store is not None else read_csv_window(filepath, symbol, start, end, index_col)
+              for symbol in symbols]
+    columns = [frame["price"].to_numpy() for frame in frames]
+    prices = np.full((max(len(column) for column in columns), len(columns)), np.nan)
+    for i, column in enumerate(columns):
+        prices[:len(column), i] = column
+    return pd.DataFrame(prices, columns = symbols)
+
+
+def strategy_bars(position, returns, valid):
+    ''' Per-bar strategy log returns before costs and trades of positions (same accounting as test_strategy).
+
+    Bar t (t >= 1, i.e. row t - 1 of the outputs) earns position(t-1) * returns(t) if both bars
+    are complete; trades in bar t are only counted if bar t-1 has a strategy return as well
+    (first bar: diff().fillna(0)). Works on 1-D and (bars x symbols) arrays.
+
+    Returns
+    -------
+    gross, trades, kept: arrays with one row less than the inputs
+    '''
+    position = np.asarray(position, dtype = "float64")
+    returns = np.asarray(returns, dtype = "float64")
+    valid = np.asarray(valid)
+
+    kept = valid[1:] & valid[:-1]
+    gross = np.where(kept, position[:-1] * returns[1:], 0.0)
+    trades = np.zeros(kept.shape)
+    trades[1:] = np.where(kept[1:] & kept[:-1], np.abs(np.diff(position[1:], axis = 0)), 0.0)
+    return gross, trades, kept
+
+
+def strategy_metrics(position, returns, valid, tc = 0.0):
+    ''' Performance of positions computed on NumPy arrays (same accounting as test_strategy).
+
+    Works on 1-D arrays (one symbol) as well as on (bars x symbols) arrays. Only a few arrays
+    of the size of the inputs are allocated; no DataFrame is built.
+
+    Parameters
+    ----------
+    position, returns: array-like
+        positions and log returns per bar
+    valid: array-like
+        rows that are complete (kept by dropna in test_strategy)
+    tc: float
+        proportional transaction costs per trade
+
+    Returns
+    -------
+    perf, hold: float or array
+        absolute performance of the strategy and of buy and hold (not rounded)
+    trades, bars: float or array
+        number of trades and of bars with a strategy return
+    '''
+    strategy, trades, kept = strategy_bars(position, returns, valid)
+    strategy -= trades * tc
+
+    # sequential sums (cumsum), like test_strategy
+    returns = np.where(kept, np.asarray(returns, dtype = "float64")[1:], 0.0)
+    perf = np.exp(np.cumsum(strategy, axis = 0)[-1]) if len(kept) else np.exp(strategy.sum(axis = 0))
+    hold = np.exp(np.cumsum(returns, axis = 0)[-1]) if len(kept) else perf
+    return perf, hold, trades.sum(axis = 0), kept.sum(axis = 0)
+
+
+def bar_costs(spread, index):
+    ''' Returns proportional costs per trade for every bar of index.
+
+    spread is a constant (float) or a schedule (Series, e.g. half spread / price) that is
+    aligned to index (forward filled; bars before the first entry cost nothing).
+    '''
+    if spread is None:
+        return 0.0
+    if np.isscalar(spread):
+        return float(spread)
+    return spread.reindex(index, method = "ffill").fillna(0).to_numpy(dtype = "float64")
+
+
+def cost_curve(gross, trades, hold, tc_values, costs = 0.0):
+    ''' Performance as a function of the proportional costs per trade, from one pass over the positions.
+
+    The log performance is linear in tc: sum(gross) - sum(trades * costs) - tc * sum(trades).
+
+    Parameters
+    ----------
+    gross, trades: array
+        per-bar strategy log returns before costs and trades (see strategy_bars)
+    hold: float
+        buy and hold performance
+    tc_values: array-like
+        proportional costs per trade to be evaluated
+    costs: float or array
+        additional (e.g. spread) costs per trade and bar (see bar_costs)
+
+    Returns
+    -------
+    curve: DataFrame
+        performance and outperformance (rounded like test_strategy) per tc
+    break_even: float
+        tc at which the performance is 1 (inf if there is no trade)
+    '''
+    tc_values = np.asarray(tc_values, dtype = "float64")
+    net = np.sum(gross) - np.sum(trades * costs)
+    n_trades = np.sum(trades)
+    perf = np.exp(net - tc_values * n_trades)
+    curve = pd.DataFrame({"performance": np.round(perf, 6), "outperformance": np.round(perf - hold, 6),
+                          "trades": n_trades}, index = pd.Index(tc_values, name = "tc"))
+    break_even = net / n_trades if n_trades > 0 else np.inf
+    return curve, break_even
+
+
+def summarize(position, returns, valid, tc = 0.0):
+    ''' Per-symbol performance of (bars x symbols) positions (see strategy_metrics).
+
+    Parameters
+    ----------
+    position, returns: DataFrame
+        positions and log returns per bar and symbol
+    valid: DataFrame
+        rows that are complete (kept by dropna in test_strategy)
+    tc: float
+        proportional transaction costs per trade
+
+    Returns
+    -------
+    summary: DataFrame
+        performance, outperformance (rounded like test_strategy), trades and number of bars per symbol
+    '''
+    perf, hold, trades, bars = strategy_metrics(position, returns, valid, tc)
+    summary = pd.DataFrame({"performance": np.round(perf, 6), "outperformance": np.round(perf - hold, 6),
+                            "trades": trades, "bars": bars}, index = returns.columns)
+    summary.loc[bars == 0, ["performance", "outperformance"]] = np.nan # too few bars
+    return summary
+
+
+def performance(position, returns, valid, tc = 0.0):
+    ''' Returns perf, outperf (rounded like test_strategy) and the number of trades of one symbol (see strategy_metrics).
+    '''
+    perf, hold, trades, bars = strategy_metrics(position, returns, valid, tc)
+    if bars == 0:
+        raise IndexError("No complete bars to backtest.") # like results.iloc[-1] in test_strategy
+    return round(perf, 6), round(perf - hold, 6), trades
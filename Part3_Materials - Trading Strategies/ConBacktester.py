@@ -2,6 +2,13 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from PriceStore import read_prices
+from BarPyramid import get_bars
+from GridOptimizer import contrarian_grid
+from ResultCache import memoized
+from BatchBacktest import price_matrix, summarize, performance, strategy_bars, bar_costs, cost_curve
+from ExecutionCosts import spread_array, spread_performance
+from ParallelOptimizer import parallel_grid
 plt.style.use("seaborn-v0_8")
 
 
@@ -9,7 +16,7 @@ class ConBacktester():
     ''' Class for the vectorized backtesting of simple contrarian trading strategies.
     '''    
     
-    def __init__(self, symbol, start, end, tc):
+    def __init__(self, symbol, start, end, tc, bar_length = None, precision = "float64"):
         '''
         Parameters
         ----------
@@ -21,36 +28,77 @@ class ConBacktester():
             end date for data import
         tc: float
             proportional transaction/trading costs per trade
+        bar_length: str (optional)
+            bar length (e.g. "20min", "4h", "1D") read from the cached bar pyramid instead of intraday_pairs.csv
+        precision: str (default "float64")
+            dtype of prices, returns and indicators ("float32" halves memory and bandwidth for large sweeps;
+            cumulative returns are always accumulated in float64); positions can differ from float64 on
+            bars where the rolling mean of returns is zero (perf/outperf within 5e-3, see tests/test_precision.py)
         '''
         self.symbol = symbol
         self.start = start
         self.end = end
+        self.bar_length = bar_length
+        self.precision = precision
         self.tc = tc
         self.results = None
-        self.get_data()
+        self._data = None # imported lazily on first use, see preload()
         
     def __repr__(self):
         return "ConBacktester(symbol = {}, start = {}, end = {})".format(self.symbol, self.start, self.end)
         
+    @property
+    def data(self):
+        ''' Dataset (imported on first access).
+        '''
+        if self._data is None:
+            self.preload()
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+
+    def preload(self):
+        ''' Imports the data now instead of on first use (e.g. to pay the loading cost up front).
+        '''
+        if self._data is None:
+            self.get_data()
+
     def get_data(self):
         ''' Imports the data from intraday_pairs.csv (source can be changed).
         '''
-        raw = pd.read_csv("intraday_pairs.csv", parse_dates = ["time"], index_col = "time")
-        raw = raw[self.symbol].to_frame().dropna()
-        raw = raw.loc[self.start:self.end].copy()
-        raw.rename(columns={self.symbol: "price"}, inplace=True)
+        if self.bar_length is not None:
+            raw = get_bars(self.symbol, self.bar_length, self.start, self.end)
+        else:
+            raw = read_prices("intraday_pairs.csv", self.symbol, self.start, self.end)
         raw["returns"] = np.log(raw / raw.shift(1))
-        self.data = raw
+        self.data = raw.astype(self.precision, copy = False)
+        
+    def positions(self, window):
+        ''' Returns the positions and the complete rows (as arrays) for a window.
+        '''
+        position = -np.sign(self.data["returns"].rolling(window).mean().to_numpy())
+        valid = ~np.isnan(self.data.to_numpy(dtype = "float64")).any(axis = 1) # rows kept by dropna()
+        return position, valid & ~np.isnan(position)
         
-    def test_strategy(self, window = 1):
+    @memoized("window")
+    def test_strategy(self, window = 1, metrics_only = False):
         ''' Backtests the simple contrarian trading strategy.
         
         Parameters
         ----------
         window: int
             time window (number of bars) to be considered for the strategy.
+        metrics_only: boolean (default = False)
+            if True, perf, outperf and the number of trades are computed on NumPy arrays
+            (fast path for optimizations); results is not updated
         '''
         self.window = window
+        if metrics_only:
+            position, valid = self.positions(self.window)
+            return performance(position, self.data["returns"].to_numpy(), valid, self.tc)
+        
         data = self.data.copy().dropna()
         data["position"] = -np.sign(data["returns"].rolling(self.window).mean())
         data["strategy"] = data["position"].shift(1) * data["returns"]
@@ -62,8 +110,8 @@ class ConBacktester():
         # subtract transaction/trading costs from pre-cost return
         data.strategy = data.strategy - data.trades * self.tc
         
-        data["creturns"] = data["returns"].cumsum().apply(np.exp)
-        data["cstrategy"] = data["strategy"].cumsum().apply(np.exp)
+        data["creturns"] = data["returns"].astype("float64", copy = False).cumsum().apply(np.exp)
+        data["cstrategy"] = data["strategy"].astype("float64", copy = False).cumsum().apply(np.exp)
         self.results = data
         
         perf = data["cstrategy"].iloc[-1] # absolute performance of the strategy
@@ -71,6 +119,86 @@ class ConBacktester():
         
         return round(perf, 6), round(outperf, 6)
     
+    @classmethod
+    def test_many(cls, symbols, window, start, end, tc):
+        ''' Backtests the simple contrarian trading strategy for several symbols in one vectorized pass.
+
+        Indicators, positions and returns are computed on the (bars x symbols) price matrix
+        (see BatchBacktest). Results are the same as test_strategy(window) per symbol.
+
+        Parameters
+        ----------
+        symbols: list
+            ticker symbols (columns of intraday_pairs.csv)
+        window: int
+            time window (number of bars) to be considered for the strategy
+        start, end, tc:
+            see ConBacktester
+
+        Returns
+        -------
+        summary: DataFrame
+            performance, outperformance, trades and number of bars per symbol
+        '''
+        prices = price_matrix("intraday_pairs.csv", symbols, start, end)
+        returns = np.log(prices / prices.shift(1))
+        position = -np.sign(returns.rolling(window).mean())
+        valid = returns.notna() & position.notna()
+        return summarize(position, returns, valid, tc)
+    
+    def tc_sweep(self, tc_values, window = 1, spread = None):
+        ''' Performance curve as a function of the proportional costs per trade (one pass over the positions).
+
+        Parameters
+        ----------
+        tc_values: array-like
+            proportional costs per trade to be evaluated
+        window: int
+            time window (number of bars) to be considered for the strategy
+        spread: float or Series (optional)
+            additional costs per trade: constant or schedule over time (e.g. half spread / price)
+
+        Returns
+        -------
+        curve: DataFrame
+            performance, outperformance and trades per tc
+        break_even: float
+            tc at which the strategy breaks even (performance = 1)
+        '''
+        self.window = window
+        position, valid = self.positions(window)
+        returns = self.data["returns"].to_numpy()
+        gross, trades, kept = strategy_bars(position, returns, valid)
+        hold = np.exp(np.sum(returns[1:][kept]))
+        costs = bar_costs(spread, self.data.index)
+        return cost_curve(gross, trades, hold, tc_values, costs if np.isscalar(costs) else costs[1:])
+    
+    def test_spread_costs(self, spread, window = 1):
+        ''' Backtests the strategy with bid-ask spread costs filled like in IterativeBase (vectorized, see ExecutionCosts).
+
+        Trades are executed at the ask/bid price of the trade bar and the full balance is
+        invested in every position (no proportional tc).
+
+        Parameters
+        ----------
+        spread: float or Series
+            absolute bid-ask spread: constant or per bar (e.g. the spread column of detailed.csv)
+        window: int
+            time window (number of bars) to be considered for the strategy
+
+        Returns
+        -------
+        perf, outperf: float
+            absolute performance and out-/underperformance of the strategy (rounded like test_strategy)
+        trades: int
+            number of trades (incl. closing the final position)
+        '''
+        position, valid = self.positions(window)
+        price = self.data["price"].to_numpy()
+        perf, trades = spread_performance(position, price, spread_array(spread, self.data.index), valid)
+        hold = price[valid][-1] / price[valid][0] # buy and hold over the same bars
+        return round(perf, 6), round(perf - hold, 6), trades
+    
     def plot_results(self):
         ''' Plots the performance of the trading strategy and compares to "buy and hold".
         '''
@@ -80,20 +208,32 @@ class ConBacktester():
             title = "{} | Window = {} | TC = {}".format(self.symbol, self.window, self.tc)
             self.results[["creturns", "cstrategy"]].plot(title=title, figsize=(12, 8))
             
-    def optimize_parameter(self, window_range):
+    def optimize_parameter(self, window_range, vectorized = True, processes = 1):
         ''' Finds the optimal strategy (global maximum) given the window parameter range.
 
         Parameters
         ----------
         window_range: tuple
             tuples of the form (start, end, step size)
+        vectorized: boolean (default = True)
+            whether all windows are scored in one pass (GridOptimizer.contrarian_grid)
+            instead of running test_strategy() for each window
+        processes: int (default 1)
+            number of worker processes scoring the vectorized grid (None: all cores, see ParallelOptimizer)
         '''
         
         windows = range(*window_range)
             
-        results = []
-        for window in windows:
-            results.append(self.test_strategy(window)[0])
+        if vectorized:
+            if processes == 1:
+                perf, trades = contrarian_grid(self.data["returns"], windows, self.tc)
+            else:
+                perf, trades = parallel_grid(contrarian_grid, [self.data["returns"]], windows, self.tc, processes = processes)
+            results = list(np.round(perf, 6))
+        else:
+            results = []
+            for window in windows:
+                results.append(self.test_strategy(window, metrics_only = True)[0])
         
         best_perf = np.max(results) # best performance
         opt = windows[np.argmax(results)] # optimal parameter
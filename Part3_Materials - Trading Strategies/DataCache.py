@@ -0,0 +1,293 @@
+import os
+import json
+import errno
+import shutil
+import pandas as pd
+import numpy as np
+
+
+CACHE_DIR = "__datacache__"
+CACHE_VERSION = 2
+
+
+def cache_path(filepath, variant = None):
+    ''' Returns the directory holding the columnar cache of a csv file.
+
+    variant names additional frames derived from the same csv file (e.g. resampled bars).
+    '''
+    folder, name = os.path.split(os.path.abspath(filepath))
+    if variant is not None:
+        name = "{}@{}".format(name, variant)
+    return os.path.join(folder, CACHE_DIR, name)
+
+
+def source_stamp(filepath):
+    ''' Returns mtime (ns) and size of the source file (used to invalidate the cache).
+    '''
+    stat = os.stat(filepath)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def read_json(path):
+    ''' Returns the content of a json file (None if it doesn't exist or can't be parsed).
+    '''
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_meta(filepath, variant = None, index_col = None):
+    ''' Returns the cache metadata if the cache exists and matches the source file, otherwise None.
+
+    With index_col, the cache must also have been built with that index column.
+    '''
+    meta = read_json(os.path.join(cache_path(filepath, variant), "meta.json"))
+    if meta is None or meta.get("version") != CACHE_VERSION or meta.get("source") != source_stamp(filepath):
+        return None
+    if index_col is not None and meta.get("index_name") != index_col:
+        return None
+    return meta
+
+
+def write_cache(filepath, raw, variant = None):
+    ''' Writes a DataFrame with a DatetimeIndex as columnar cache (int64 epoch-ns index, float64 columns).
+
+    Returns False (and writes nothing) if the frame can't be represented in the cache format.
+    '''
+    if not isinstance(raw.index, pd.DatetimeIndex):
+        return False
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in raw.dtypes):
+        return False
+
+    path = cache_path(filepath, variant)
+    tmp = path + ".tmp{}".format(os.getpid())
+    shutil.rmtree(tmp, ignore_errors = True)
+    os.makedirs(tmp)
+
+    stamps = np.asarray(raw.index.values, dtype = "datetime64[ns]").view("int64")
+    np.save(os.path.join(tmp, "index.npy"), stamps)
+    for i, col in enumerate(raw.columns):
+        np.save(os.path.join(tmp, "col_{}.npy".format(i)), raw[col].to_numpy(dtype = "float64"))
+
+    meta = {"version": CACHE_VERSION,
+            "source": source_stamp(filepath),
+            "index_name": raw.index.name,
+            "tz": None if raw.index.tz is None else str(raw.index.tz),
+            "columns": [str(col) for col in raw.columns],
+            "sorted": bool(raw.index.is_monotonic_increasing)}
+    commit_cache(path, tmp, meta)
+    return True
+
+
+def commit_cache(path, tmp, meta, attempts = 5):
+    ''' Writes the metadata and swaps in the complete cache directory (readers never see a half-written cache).
+
+    Several processes may build the same cache at the same time (e.g. web workers or notebooks
+    starting together). If another process has committed a cache with the same metadata
+    (same source file) in the meantime, that cache is kept and the own copy is discarded;
+    an outdated cache is replaced.
+
+    Returns True if the own copy was committed.
+    '''
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    for attempt in range(attempts):
+        try:
+            os.replace(tmp, path) # atomic; fails if path is a non-empty directory
+            return True
+        except OSError as error:
+            if error.errno not in (errno.ENOTEMPTY, errno.EEXIST) or attempt == attempts - 1:
+                shutil.rmtree(tmp, ignore_errors = True)
+                raise
+        if read_json(os.path.join(path, "meta.json")) == meta: # committed by another process
+            shutil.rmtree(tmp, ignore_errors = True)
+            return False
+        shutil.rmtree(path, ignore_errors = True) # outdated (or half-deleted) cache
+
+
+def count_rows(filepath):
+    ''' Counts the (non-blank) data rows of a csv file without parsing it.
+    '''
+    with open(filepath, "rb") as f:
+        rows = sum(1 for line in f if line.strip())
+    return max(rows - 1, 0) # header
+
+
+def build_cache_chunked(filepath, index_col, chunksize = 500000):
+    ''' Converts a csv file into the columnar cache chunk by chunk.
+
+    The columns are written into memory-mapped .npy files, so that peak memory is
+    bounded by chunksize (and not by the size of the file). The csv file must be
+    sorted by index_col.
+
+    Parameters
+    ----------
+    filepath: str
+        path to the csv file
+    index_col: str
+        column to be used as (datetime) index
+    chunksize: int
+        number of rows parsed at once
+    '''
+    rows = count_rows(filepath)
+    path = cache_path(filepath)
+    tmp = path + ".tmp{}".format(os.getpid())
+    shutil.rmtree(tmp, ignore_errors = True)
+    os.makedirs(tmp)
+
+    meta = None
+    arrays = []
+    pos = 0
+    last = None
+    reader = pd.read_csv(filepath, parse_dates = [index_col], index_col = index_col, chunksize = chunksize)
+    for chunk in reader:
+        if meta is None:
+            meta = {"version": CACHE_VERSION,
+                    "source": source_stamp(filepath),
+                    "index_name": chunk.index.name,
+                    "tz": None if chunk.index.tz is None else str(chunk.index.tz),
+                    "columns": [str(col) for col in chunk.columns],
+                    "sorted": True}
+            arrays.append(np.lib.format.open_memmap(os.path.join(tmp, "index.npy"), mode = "w+",
+                                                    dtype = "int64", shape = (rows,)))
+            for i in range(len(chunk.columns)):
+                arrays.append(np.lib.format.open_memmap(os.path.join(tmp, "col_{}.npy".format(i)), mode = "w+",
+                                                        dtype = "float64", shape = (rows,)))
+        stamps = np.asarray(chunk.index.values, dtype = "datetime64[ns]").view("int64")
+        if len(stamps) and (np.any(np.diff(stamps) < 0) or (last is not None and stamps[0] < last)):
+            shutil.rmtree(tmp, ignore_errors = True)
+            raise ValueError("{} is not sorted by {}.".format(filepath, index_col))
+        arrays[0][pos:pos + len(chunk)] = stamps
+        for i, col in enumerate(chunk.columns):
+            arrays[i + 1][pos:pos + len(chunk)] = chunk[col].to_numpy(dtype = "float64")
+        pos += len(chunk)
+        if len(stamps):
+            last = stamps[-1]
+
+    if meta is None or pos != rows: # empty file or rows pandas skipped (e.g. comments)
+        shutil.rmtree(tmp, ignore_errors = True)
+        raise ValueError("Could not convert {} chunk by chunk.".format(filepath))
+    for array in arrays:
+        array.flush()
+    del arrays
+    commit_cache(path, tmp, meta)
+    return meta
+
+
+def to_datetime_index(stamps, meta):
+    ''' Converts cached epoch-ns stamps into a (tz-aware) DatetimeIndex.
+    '''
+    index = pd.DatetimeIndex(np.asarray(stamps).view("datetime64[ns]"), name = meta["index_name"])
+    if meta["tz"] is not None:
+        index = index.tz_localize("UTC").tz_convert(meta["tz"])
+    return index
+
+
+def load_columns(filepath, meta, variant = None, mmap_mode = None):
+    ''' Loads (or memory-maps) the cached index and columns described by meta.
+
+    Returns None if the cache was replaced or removed by another process while loading
+    (files missing or metadata changed); the caller then reads the metadata again. The
+    arrays are a consistent snapshot of the cache described by meta.
+    '''
+    path = cache_path(filepath, variant)
+    try:
+        stamps = np.load(os.path.join(path, "index.npy"), mmap_mode = mmap_mode)
+        columns = [np.load(os.path.join(path, "col_{}.npy".format(i)), mmap_mode = mmap_mode)
+                   for i in range(len(meta["columns"]))]
+    except (OSError, ValueError):
+        return None
+    if read_json(os.path.join(path, "meta.json")) != meta or any(len(column) != len(stamps) for column in columns):
+        return None
+    return stamps, columns
+
+
+def load_cache(filepath, meta, variant = None):
+    ''' Loads the cached columns into a DataFrame (None if the cache was swapped out meanwhile, see load_columns).
+    '''
+    arrays = load_columns(filepath, meta, variant)
+    if arrays is None:
+        return None
+    stamps, columns = arrays
+    return pd.DataFrame(dict(zip(meta["columns"], columns)), index = to_datetime_index(stamps, meta),
+                        columns = meta["columns"])
+
+
+def read_csv_cached(filepath, parse_dates, index_col):
+    ''' Drop-in replacement for pd.read_csv(filepath, parse_dates = parse_dates, index_col = index_col).
+
+    The first call parses the csv file and stores a binary columnar copy next to it
+    (in __datacache__/). Later calls load the binary copy as long as mtime and size
+    of the csv file are unchanged and the same index column is requested. The cache
+    holds a datetime index and numeric columns only, so it is used for parse_dates =
+    [index_col] (other calls parse the csv file).
+
+    Parameters
+    ----------
+    filepath: str
+        path to the csv file
+    parse_dates: list
+        columns to be parsed as dates (must include index_col)
+    index_col: str
+        column to be used as (datetime) index
+    '''
+    meta = read_meta(filepath, index_col = index_col) if list(parse_dates) == [index_col] else None
+    if meta is not None:
+        raw = load_cache(filepath, meta)
+        if raw is not None:
+            return raw
+
+    raw = pd.read_csv(filepath, parse_dates = parse_dates, index_col = index_col)
+    try:
+        write_cache(filepath, raw)
+    except OSError: # e.g. read-only data directory -> work without cache
+        pass
+    return raw
+
+
+def read_csv_window(filepath, symbol, start = None, end = None, index_col = "time", chunksize = 100000):
+    ''' Streams the prices of one symbol between start and end from a (huge) csv file.
+
+    Only the index column and the symbol column are parsed (usecols), chunks before start
+    are dropped and reading stops at the first chunk reaching beyond end, so peak memory is
+    bounded by chunksize instead of the file size. The csv file must be sorted by index_col.
+    The result is identical to raw[symbol].to_frame().dropna().loc[start:end] (column
+    renamed to "price").
+
+    Parameters
+    ----------
+    filepath: str
+        path to the csv file
+    symbol: str
+        column to be imported
+    start: str
+        start date (inclusive)
+    end: str
+        end date (inclusive)
+    index_col: str
+        column to be used as (datetime) index
+    chunksize: int
+        number of rows parsed at once
+    '''
+    reader = pd.read_csv(filepath, usecols = [index_col, symbol], parse_dates = [index_col],
+                         index_col = index_col, chunksize = chunksize)
+    parts = []
+    with reader:
+        for chunk in reader:
+            prices = chunk[symbol].dropna()
+            window = prices.index.slice_indexer(start, end)
+            parts.append(prices.iloc[window])
+            if window.stop < len(prices): # beyond end -> skip the rest of the file
+                break
+    parts = [part for part in parts if len(part)] or parts[:1]
+    if not parts: # empty file
+        return pd.DataFrame(columns = ["price"], index = pd.DatetimeIndex([], name = index_col), dtype = "float64")
+    return pd.concat(parts).to_frame(name = "price")
+
+
+def clear_cache(filepath):
+    ''' Deletes the columnar cache of a csv file.
+    '''
+    shutil.rmtree(cache_path(filepath), ignore_errors = True)
@@ -1,5 +1,7 @@
 
 from IterativeBase import *
+from itertools import product
+from ParallelOptimizer import parallel_method
 
 class IterativeBacktest(IterativeBase):
     ''' Class for iterative (event-driven) backtesting of trading strategies.
@@ -27,7 +29,92 @@ class IterativeBacktest(IterativeBase):
                 amount = self.current_balance
             self.sell_instrument(bar, amount = amount) # go short
 
-    def test_sma_strategy(self, SMA_S, SMA_L):
+    # helper method
+    def trade_change_points(self, signal):
+        ''' Runs the order logic only at the bars where the target position changes.
+
+        signal: array with 1 (go long), -1 (go short) or 0 (no signal, keep the position) for all
+        bars except the last one. The target position is the last non-zero signal, so orders are
+        placed exactly where the bar-by-bar loop would place them.
+        '''
+        target = pd.Series(np.where(signal != 0, signal, np.nan)).ffill().fillna(0).to_numpy()
+        for bar in np.flatnonzero(np.diff(target, prepend = 0)): # change points (initial position: 0)
+            if target[bar] == 1:
+                self.go_long(bar, amount = "all") # go long with full amount
+                self.position = 1  # long position
+            else:
+                self.go_short(bar, amount = "all") # go short with full amount
+                self.position = -1 # short position
+
+    # event loop
+    def run_sma_strategy(self, sma_s, sma_l, change_points = False):
+        ''' Runs the SMA crossover strategy on the prepared data (arrays aligned with the bars of self.data).
+        '''
+        if change_points:
+            self.trade_change_points(np.sign(sma_s[:-1] - sma_l[:-1])) # all bars (except the last bar)
+            self.close_pos(len(self.data)-1) # close position at the last bar
+            return
+        for bar in range(len(self.data)-1): # all bars (except the last bar)
+            if sma_s[bar] > sma_l[bar]: # signal to go long
+                if self.position in [0, -1]:
+                    self.go_long(bar, amount = "all") # go long with full amount
+                    self.position = 1  # long position
+            elif sma_s[bar] < sma_l[bar]: # signal to go short
+                if self.position in [0, 1]:
+                    self.go_short(bar, amount = "all") # go short with full amount
+                    self.position = -1 # short position
+        self.close_pos(bar+1) # close position at the last bar
+
+    # event loop
+    def run_con_strategy(self, rolling_returns, change_points = False):
+        ''' Runs the contrarian strategy on the prepared data (array aligned with the bars of self.data).
+        '''
+        if change_points:
+            self.trade_change_points(np.where(rolling_returns[:-1] <= 0, 1, -1)) # all bars (except the last bar)
+            self.close_pos(len(self.data)-1) # close position at the last bar
+            return
+        for bar in range(len(self.data)-1): # all bars (except the last bar)
+            if rolling_returns[bar] <= 0: #signal to go long
+                if self.position in [0, -1]:
+                    self.go_long(bar, amount = "all") # go long with full amount
+                    self.position = 1  # long position
+            elif rolling_returns[bar] > 0: #signal to go short
+                if self.position in [0, 1]:
+                    self.go_short(bar, amount = "all") # go short with full amount
+                    self.position = -1 # short position
+        self.close_pos(bar+1) # close position at the last bar
+
+    # event loop
+    def run_boll_strategy(self, price, sma, lower, upper):
+        ''' Runs the Bollinger Bands strategy on the prepared data (arrays aligned with the bars of self.data).
+        '''
+        for bar in range(len(self.data)-1): # all bars (except the last bar)
+            if self.position == 0: # when neutral
+                if price[bar] < lower[bar]: # signal to go long
+                    self.go_long(bar, amount = "all") # go long with full amount
+                    self.position = 1  # long position
+                elif price[bar] > upper[bar]: # signal to go Short
+                    self.go_short(bar, amount = "all") # go short with full amount
+                    self.position = -1 # short position
+            elif self.position == 1: # when long
+                if price[bar] > sma[bar]:
+                    if price[bar] > upper[bar]: # signal to go short
+                        self.go_short(bar, amount = "all") # go short with full amount
+                        self.position = -1 # short position
+                    else:
+                        self.sell_instrument(bar, units = self.units) # go neutral
+                        self.position = 0
+            elif self.position == -1: # when short
+                if price[bar] < sma[bar]:
+                    if price[bar] < lower[bar]: # signal to go long
+                        self.go_long(bar, amount = "all") # go long with full amount
+                        self.position = 1 # long position
+                    else:
+                        self.buy_instrument(bar, units = -self.units) # go neutral
+                        self.position = 0                
+        self.close_pos(bar+1) # close position at the last bar
+
+    def test_sma_strategy(self, SMA_S, SMA_L, change_points = False):
         ''' 
         Backtests an SMA crossover strategy with SMA_S (short) and SMA_L (long).
         
@@ -37,39 +124,38 @@ class IterativeBacktest(IterativeBase):
             moving window in bars (e.g. days) for shorter SMA
         SMA_L: int
             moving window in bars (e.g. days) for longer SMA
+        change_points: boolean (default = False)
+            if True, the signal is computed vectorized and orders are only processed at the
+            bars where it flips (same trades and results as the bar-by-bar loop)
         '''
         
         # nice printout
         stm = "Testing SMA strategy | {} | SMA_S = {} & SMA_L = {}".format(self.symbol, SMA_S, SMA_L)
-        print("-" * 75)
-        print(stm)
-        print("-" * 75)
+        if self.verbose >= SUMMARY:
+            print("-" * 75)
+            print(stm)
+            print("-" * 75)
         
         # reset 
         self.position = 0  # initial neutral position
         self.trades = 0  # no trades yet
         self.current_balance = self.initial_balance  # reset initial capital
         self.get_data() # reset dataset
+        self.journal.reset() # no trades yet
+        self.journal.reserve(len(self.data))
         
         # prepare data
         self.data["SMA_S"] = self.data["price"].rolling(SMA_S).mean()
         self.data["SMA_L"] = self.data["price"].rolling(SMA_L).mean()
         self.data.dropna(inplace = True)
+        self.load_arrays()
+        sma_s, sma_l = self.data["SMA_S"].to_numpy(), self.data["SMA_L"].to_numpy()
 
         # sma crossover strategy
-        for bar in range(len(self.data)-1): # all bars (except the last bar)
-            if self.data["SMA_S"].iloc[bar] > self.data["SMA_L"].iloc[bar]: # signal to go long
-                if self.position in [0, -1]:
-                    self.go_long(bar, amount = "all") # go long with full amount
-                    self.position = 1  # long position
-            elif self.data["SMA_S"].iloc[bar] < self.data["SMA_L"].iloc[bar]: # signal to go short
-                if self.position in [0, 1]:
-                    self.go_short(bar, amount = "all") # go short with full amount
-                    self.position = -1 # short position
-        self.close_pos(bar+1) # close position at the last bar
+        self.run_sma_strategy(sma_s, sma_l, change_points)
         
         
-    def test_con_strategy(self, window = 1):
+    def test_con_strategy(self, window = 1, change_points = False):
         ''' 
         Backtests a simple contrarian strategy.
         
@@ -77,35 +163,34 @@ class IterativeBacktest(IterativeBase):
         ----------
         window: int
             time window (number of bars) to be considered for the strategy.
+        change_points: boolean (default = False)
+            if True, the signal is computed vectorized and orders are only processed at the
+            bars where it flips (same trades and results as the bar-by-bar loop)
         '''
         
         # nice printout
         stm = "Testing Contrarian strategy | {} | Window = {}".format(self.symbol, window)
-        print("-" * 75)
-        print(stm)
-        print("-" * 75)
+        if self.verbose >= SUMMARY:
+            print("-" * 75)
+            print(stm)
+            print("-" * 75)
         
         # reset 
         self.position = 0  # initial neutral position
         self.trades = 0  # no trades yet
         self.current_balance = self.initial_balance  # reset initial capital
         self.get_data() # reset dataset
+        self.journal.reset() # no trades yet
+        self.journal.reserve(len(self.data))
         
         # prepare data
         self.data["rolling_returns"] = self.data["returns"].rolling(window).mean()
         self.data.dropna(inplace = True)
+        self.load_arrays()
+        rolling_returns = self.data["rolling_returns"].to_numpy()
         
         # Contrarian strategy
-        for bar in range(len(self.data)-1): # all bars (except the last bar)
-            if self.data["rolling_returns"].iloc[bar] <= 0: #signal to go long
-                if self.position in [0, -1]:
-                    self.go_long(bar, amount = "all") # go long with full amount
-                    self.position = 1  # long position
-            elif self.data["rolling_returns"].iloc[bar] > 0: #signal to go short
-                if self.position in [0, 1]:
-                    self.go_short(bar, amount = "all") # go short with full amount
-                    self.position = -1 # short position
-        self.close_pos(bar+1) # close position at the last bar
+        self.run_con_strategy(rolling_returns, change_points)
         
         
     def test_boll_strategy(self, SMA, dev):
@@ -122,46 +207,184 @@ class IterativeBacktest(IterativeBase):
         
         # nice printout
         stm = "Testing Bollinger Bands Strategy | {} | SMA = {} & dev = {}".format(self.symbol, SMA, dev)
-        print("-" * 75)
-        print(stm)
-        print("-" * 75)
+        if self.verbose >= SUMMARY:
+            print("-" * 75)
+            print(stm)
+            print("-" * 75)
         
         # reset 
         self.position = 0  # initial neutral position
         self.trades = 0  # no trades yet
         self.current_balance = self.initial_balance  # reset initial capital
         self.get_data() # reset dataset
+        self.journal.reset() # no trades yet
+        self.journal.reserve(len(self.data))
         
         # prepare data
         self.data["SMA"] = self.data["price"].rolling(SMA).mean()
         self.data["Lower"] = self.data["SMA"] - self.data["price"].rolling(SMA).std() * dev
         self.data["Upper"] = self.data["SMA"] + self.data["price"].rolling(SMA).std() * dev
         self.data.dropna(inplace = True) 
+        self.load_arrays()
+        price, sma = self.data["price"].to_numpy(), self.data["SMA"].to_numpy()
+        lower, upper = self.data["Lower"].to_numpy(), self.data["Upper"].to_numpy()
         
         # Bollinger strategy
-        for bar in range(len(self.data)-1): # all bars (except the last bar)
-            if self.position == 0: # when neutral
-                if self.data["price"].iloc[bar] < self.data["Lower"].iloc[bar]: # signal to go long
-                    self.go_long(bar, amount = "all") # go long with full amount
-                    self.position = 1  # long position
-                elif self.data["price"].iloc[bar] > self.data["Upper"].iloc[bar]: # signal to go Short
-                    self.go_short(bar, amount = "all") # go short with full amount
-                    self.position = -1 # short position
-            elif self.position == 1: # when long
-                if self.data["price"].iloc[bar] > self.data["SMA"].iloc[bar]:
-                    if self.data["price"].iloc[bar] > self.data["Upper"].iloc[bar]: # signal to go short
-                        self.go_short(bar, amount = "all") # go short with full amount
-                        self.position = -1 # short position
-                    else:
-                        self.sell_instrument(bar, units = self.units) # go neutral
-                        self.position = 0
-            elif self.position == -1: # when short
-                if self.data["price"].iloc[bar] < self.data["SMA"].iloc[bar]:
-                    if self.data["price"].iloc[bar] < self.data["Lower"].iloc[bar]: # signal to go long
-                        self.go_long(bar, amount = "all") # go long with full amount
-                        self.position = 1 # long position
-                    else:
-                        self.buy_instrument(bar, units = -self.units) # go neutral
-                        self.position = 0                
-        self.close_pos(bar+1) # close position at the last bar
-     
\ No newline at end of file
+        self.run_boll_strategy(price, sma, lower, upper)
+
+
+    # helper method
+    def prepare_sweep(self, strategy, windows):
+        ''' Imports the data once and computes the indicators of all windows once (for score_combinations).
+
+        strategy: "sma", "con" or "boll"
+        '''
+        self.get_data() # one import for all combinations
+        data = self.data
+        self.load_arrays()
+        rolling = data["returns"] if strategy == "con" else data["price"]
+        indicators = {}
+        for window in windows:
+            if strategy == "boll":
+                indicators[window] = (rolling.rolling(window).mean().to_numpy(), rolling.rolling(window).std().to_numpy())
+            else:
+                indicators[window] = rolling.rolling(window).mean().to_numpy()
+        self._sweep = (strategy, data, self._fills[2], self._fills[3], indicators)
+
+    # helper method
+    def combination_arrays(self, combination):
+        ''' Returns the input arrays of the event loop for a parameter combination (full length).
+        '''
+        strategy, data, prices, spreads, indicators = self._sweep
+        if strategy == "sma":
+            return [indicators[combination[0]], indicators[combination[1]]]
+        elif strategy == "con":
+            return [indicators[combination[0]]]
+        sma, std = indicators[combination[0]]
+        dev = combination[1]
+        return [data["price"].to_numpy(), sma, sma - std * dev, sma + std * dev]
+
+    def score_combinations(self, combinations):
+        ''' Runs the event loop (silently) for every parameter combination on the prepared data (see prepare_sweep).
+
+        The data of a combination is the imported dataset without the first bars (where
+        returns or indicators are missing), i.e. exactly the data of test_*_strategy; it
+        is sliced, not copied or re-imported.
+
+        Returns
+        -------
+        list of (performance, trades): absolute performance (final balance / initial balance,
+        rounded to 6 decimals) and number of trades; NaN if fewer than two bars are left
+        '''
+        strategy, data, prices, spreads, indicators = self._sweep
+        run = getattr(self, "run_{}_strategy".format(strategy))
+        returns_valid = ~np.isnan(data["returns"].to_numpy())
+        verbose, self.verbose = self.verbose, SILENT
+        results = []
+        try:
+            for combination in combinations:
+                arrays = self.combination_arrays(combination)
+                valid = returns_valid.copy()
+                for array in arrays:
+                    valid &= ~np.isnan(array)
+                start = np.argmax(valid) if valid.any() else len(valid) # dropna: only leading bars are incomplete
+                if len(valid) - start < 2:
+                    results.append((np.nan, 0))
+                    continue
+
+                # reset
+                self.position = 0
+                self.trades = 0
+                self.current_balance = self.initial_balance
+                self.journal.reset()
+                self.journal.reserve(len(valid) - start)
+                self.data = data.iloc[start:]
+                self._fills = (self._data, len(self._data), prices[start:], spreads[start:])
+
+                run(*[array[start:] for array in arrays])
+                results.append((round(self.current_balance / self.initial_balance, 6), self.trades))
+        finally:
+            self.verbose = verbose
+            self.data = data
+        return results
+
+    # helper method
+    def run_sweep(self, strategy, windows, combinations, names, processes):
+        ''' Scores all combinations (in worker processes if processes != 1) and stores results_overview.
+        '''
+        self.prepare_sweep(strategy, windows)
+        try:
+            if processes == 1:
+                results = self.score_combinations(combinations)
+            else:
+                results = parallel_method(self, "score_combinations", combinations, processes = processes)
+        finally:
+            del self._sweep
+
+        many_results = pd.DataFrame(data = combinations, columns = names)
+        many_results["performance"] = [result[0] for result in results]
+        many_results["trades"] = [result[1] for result in results]
+        self.results_overview = many_results
+
+        if many_results["performance"].isna().all():
+            raise ValueError("Not enough bars for any combination.")
+        best = many_results["performance"].idxmax()
+        opt = combinations[best] if len(names) > 1 else combinations[best][0]
+        return opt, many_results.loc[best, "performance"]
+
+    def optimize_sma_strategy(self, SMA_S_range, SMA_L_range, processes = 1):
+        ''' Runs the iterative SMA crossover backtest for all (SMA_S, SMA_L) combinations.
+
+        The data is imported once and every SMA is computed once; the event loops of the
+        combinations run on slices of the same dataset (in worker processes if processes != 1).
+        The optimal strategy is backtested again (with the chosen verbosity) at the end.
+
+        Parameters
+        ----------
+        SMA_S_range, SMA_L_range: tuple
+            tuples of the form (start, end, step size)
+        processes: int (default 1)
+            number of worker processes (None: all cores, see ParallelOptimizer)
+
+        Returns
+        -------
+        opt: tuple
+            optimal (SMA_S, SMA_L)
+        best_perf: float
+            absolute performance of the optimal strategy (all results in results_overview)
+        '''
+        combinations = list(product(range(*SMA_S_range), range(*SMA_L_range)))
+        windows = sorted(set(range(*SMA_S_range)) | set(range(*SMA_L_range)))
+        opt, best_perf = self.run_sweep("sma", windows, combinations, ["SMA_S", "SMA_L"], processes)
+        self.test_sma_strategy(opt[0], opt[1])
+        return opt, best_perf
+
+    def optimize_con_strategy(self, window_range, processes = 1):
+        ''' Runs the iterative contrarian backtest for all windows (see optimize_sma_strategy).
+
+        Parameters
+        ----------
+        window_range: tuple
+            tuples of the form (start, end, step size)
+        processes: int (default 1)
+            number of worker processes (None: all cores, see ParallelOptimizer)
+        '''
+        combinations = [(window,) for window in range(*window_range)]
+        opt, best_perf = self.run_sweep("con", range(*window_range), combinations, ["window"], processes)
+        self.test_con_strategy(opt)
+        return opt, best_perf
+
+    def optimize_boll_strategy(self, SMA_range, dev_range, processes = 1):
+        ''' Runs the iterative Bollinger Bands backtest for all (SMA, dev) combinations (see optimize_sma_strategy).
+
+        Parameters
+        ----------
+        SMA_range, dev_range: tuple
+            tuples of the form (start, end, step size)
+        processes: int (default 1)
+            number of worker processes (None: all cores, see ParallelOptimizer)
+        '''
+        combinations = list(product(range(*SMA_range), range(*dev_range)))
+        opt, best_perf = self.run_sweep("boll", range(*SMA_range), combinations, ["SMA", "dev"], processes)
+        self.test_boll_strategy(opt[0], opt[1])
+        return opt, best_perf
@@ -2,14 +2,39 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from DataCache import read_csv_cached
+from TradeJournal import TradeJournal, SILENT, SUMMARY, TRADES
 plt.style.use("seaborn-v0_8")
 
 
+class Account():
+    ''' Account state of an iterative backtest (slots: fast attribute access in the event loop).
+    '''
+    __slots__ = ["initial_balance", "current_balance", "units", "trades", "position"]
+
+    def __init__(self, amount):
+        self.initial_balance = amount
+        self.current_balance = amount
+        self.units = 0
+        self.trades = 0
+        self.position = 0
+
+
+def account_attribute(name):
+    ''' Property delegating to the Account of the backtester.
+    '''
+    def getter(self):
+        return getattr(self.account, name)
+    def setter(self, value):
+        setattr(self.account, name, value)
+    return property(getter, setter)
+
+
 class IterativeBase():
     ''' Base class for iterative (event-driven) backtesting of trading strategies.
     '''
 
-    def __init__(self, symbol, start, end, amount, use_spread = True):
+    def __init__(self, symbol, start, end, amount, use_spread = True, verbose = TRADES):
         '''
         Parameters
         ----------
@@ -23,22 +48,50 @@ class IterativeBase():
             initial amount to be invested per trade
         use_spread: boolean (default = True) 
             whether trading costs (bid-ask spread) are included
+        verbose: int (default = TRADES)
+            output while backtesting: SILENT (0), SUMMARY (1) or every trade (TRADES, 2);
+            all trades are recorded in the journal (see trade_log()) in any case
         '''
         self.symbol = symbol
         self.start = start
         self.end = end
-        self.initial_balance = amount
-        self.current_balance = amount
-        self.units = 0
-        self.trades = 0
-        self.position = 0
+        self.account = Account(amount)
         self.use_spread = use_spread
-        self.get_data()
+        self.verbose = verbose
+        self.journal = TradeJournal()
+        self._data = None # imported lazily on first use, see preload()
+        self._fills = None # prices/spreads of the bars as lists, see load_arrays()
+        self._results = None # per-bar account state of the last backtest, see results
+
+    initial_balance = account_attribute("initial_balance")
+    current_balance = account_attribute("current_balance")
+    units = account_attribute("units")
+    trades = account_attribute("trades")
+    position = account_attribute("position")
     
+    @property
+    def data(self):
+        ''' Dataset (imported on first access).
+        '''
+        if self._data is None:
+            self.preload()
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self._fills = None
+
+    def preload(self):
+        ''' Imports the data now instead of on first use (e.g. to pay the loading cost up front).
+        '''
+        if self._data is None:
+            self.get_data()
+
     def get_data(self):
         ''' Imports the data from detailed.csv (source can be changed).
         '''
-        raw = pd.read_csv("detailed.csv", parse_dates = ["time"], index_col = "time").dropna()
+        raw = read_csv_cached("detailed.csv", parse_dates = ["time"], index_col = "time").dropna()
         raw = raw.loc[self.start:self.end].copy()
         raw["returns"] = np.log(raw.price / raw.price.shift(1))
         self.data = raw
@@ -50,13 +103,32 @@ class IterativeBase():
             cols = "price"
         self.data[cols].plot(figsize = (12, 8), title = self.symbol)
     
+    def load_arrays(self):
+        ''' Pulls the (rounded) prices and spreads into lists once (call after preparing the data).
+        '''
+        data = self.data
+        self._fills = (data, len(data), list(np.round(data["price"].to_numpy(), 5)),
+                       list(np.round(data["spread"].to_numpy(), 5))) # numpy scalars: same rounding as before
+
+    def get_price(self, bar):
+        ''' Returns the price and the spread for the given bar.
+        '''
+        fills = self._fills
+        if fills is None or fills[0] is not self._data or fills[1] != len(fills[0]): # data replaced or changed
+            self.load_arrays()
+            fills = self._fills
+        return fills[2][bar], fills[3][bar]
+
+    def get_date(self, bar):
+        ''' Returns the date of the given bar (only formatted when it is reported).
+        '''
+        return str(self.data.index[bar].date())
+
     def get_values(self, bar):
         ''' Returns the date, the price and the spread for the given bar.
         '''
-        date = str(self.data.index[bar].date())
-        price = round(self.data.price.iloc[bar], 5)
-        spread = round(self.data.spread.iloc[bar], 5)
-        return date, price, spread
+        price, spread = self.get_price(bar)
+        return self.get_date(bar), price, spread
     
     def print_current_balance(self, bar):
         ''' Prints out the current (cash) balance.
@@ -67,7 +139,7 @@ class IterativeBase():
     def buy_instrument(self, bar, units = None, amount = None):
         ''' Places and executes a buy order (market order).
         '''
-        date, price, spread = self.get_values(bar)
+        price, spread = self.get_price(bar)
         if self.use_spread:
             price += spread/2 # ask price
         if amount is not None: # use units if units are passed, otherwise calculate units
@@ -75,12 +147,14 @@ class IterativeBase():
         self.current_balance -= units * price # reduce cash balance by "purchase price"
         self.units += units
         self.trades += 1
-        print("{} |  Buying {} for {}".format(date, units, round(price, 5)))
+        self.journal.record(bar, 1, units, price, units * spread/2 * self.use_spread, self.current_balance)
+        if self.verbose >= TRADES:
+            print("{} |  Buying {} for {}".format(self.get_date(bar), units, round(price, 5)))
     
     def sell_instrument(self, bar, units = None, amount = None):
         ''' Places and executes a sell order (market order).
         '''
-        date, price, spread = self.get_values(bar)
+        price, spread = self.get_price(bar)
         if self.use_spread:
             price -= spread/2 # bid price
         if amount is not None: # use units if units are passed, otherwise calculate units
@@ -88,7 +162,9 @@ class IterativeBase():
         self.current_balance += units * price # increases cash balance by "purchase price"
         self.units -= units
         self.trades += 1
-        print("{} |  Selling {} for {}".format(date, units, round(price, 5)))
+        self.journal.record(bar, -1, units, price, units * spread/2 * self.use_spread, self.current_balance)
+        if self.verbose >= TRADES:
+            print("{} |  Selling {} for {}".format(self.get_date(bar), units, round(price, 5)))
     
     def print_current_position_value(self, bar):
         ''' Prints out the current position value.
@@ -108,15 +184,92 @@ class IterativeBase():
         ''' Closes out a long or short position (go neutral).
         '''
         date, price, spread = self.get_values(bar)
-        print(75 * "-")
-        print("{} | +++ CLOSING FINAL POSITION +++".format(date))
-        self.current_balance += self.units * price # closing final position (works with short and long!)
-        self.current_balance -= (abs(self.units) * spread/2 * self.use_spread) # substract half-spread costs
-        print("{} | closing position of {} for {}".format(date, self.units, price))
+        if self.verbose >= SUMMARY:
+            print(75 * "-")
+            print("{} | +++ CLOSING FINAL POSITION +++".format(date))
+        units = self.units
+        cost = abs(units) * spread/2 * self.use_spread
+        self.current_balance += units * price # closing final position (works with short and long!)
+        self.current_balance -= cost # substract half-spread costs
+        if self.verbose >= SUMMARY:
+            print("{} | closing position of {} for {}".format(date, units, price))
         self.units = 0 # setting position to neutral
         self.trades += 1
+        side = -1 if units > 0 else 1 # selling a long / buying back a short position
+        self.journal.record(bar, side, abs(units), price + side * spread/2 * self.use_spread, cost, self.current_balance)
+        self._results = None # built from the journal on first access
         perf = (self.current_balance - self.initial_balance) / self.initial_balance * 100
-        self.print_current_balance(bar)
-        print("{} | net performance (%) = {}".format(date, round(perf, 2) ))
-        print("{} | number of trades executed = {}".format(date, self.trades))
-        print(75 * "-")
\ No newline at end of file
+        if self.verbose >= SUMMARY:
+            self.print_current_balance(bar)
+            print("{} | net performance (%) = {}".format(date, round(perf, 2) ))
+            print("{} | number of trades executed = {}".format(date, self.trades))
+            print(75 * "-")
+
+    def trade_log(self):
+        ''' Returns all trades of the last backtest as DataFrame (bulk export of the journal).
+        '''
+        return self.journal.to_frame(self.data.index)
+
+    def export_trades(self, path):
+        ''' Writes all trades of the last backtest to a csv file.
+        '''
+        self.journal.to_csv(path, self.data.index)
+
+    @property
+    def results(self):
+        ''' Per-bar account state and performance of the last backtest (DataFrame, built on first access).
+
+        Columns: price, position, units, cash, nav (cash + units * price at the end of the bar),
+        returns/strategy (log returns of the instrument/the nav) and creturns/cstrategy
+        (cumulative performance, like the results of the vectorized backtesters).
+        '''
+        if self._results is None:
+            self._results = self.build_results()
+        return self._results
+
+    def build_results(self):
+        ''' Reconstructs the account state of every bar from the journal.
+
+        Cash and units only change when a trade is executed; the state after the last trade
+        up to each bar is looked up with one searchsorted, so no per-bar bookkeeping is
+        needed in the event loop.
+        '''
+        data = self.data
+        journal = self.journal
+        n = journal.length
+        cash = np.concatenate([[self.initial_balance], journal.balance[:n]]) # state after 0, 1, ... trades
+        units = np.concatenate([[0.0], np.cumsum(journal.side[:n] * journal.units[:n])])
+        last = np.searchsorted(journal.bar[:n], np.arange(len(data)), side = "right") # trades up to each bar
+
+        price = np.round(data["price"].to_numpy(), 5)
+        results = pd.DataFrame({"price": price, "position": np.sign(units[last]), "units": units[last],
+                                "cash": cash[last]}, index = data.index)
+        results["nav"] = results["cash"] + results["units"] * price
+        results["returns"] = data["returns"]
+        results["strategy"] = np.log(results["nav"] / results["nav"].shift(1).fillna(self.initial_balance))
+        results["creturns"] = results["returns"].cumsum().apply(np.exp)
+        results["cstrategy"] = results["nav"] / self.initial_balance
+        return results
+
+    def risk_metrics(self):
+        ''' Returns performance, max drawdown, Sharpe ratio, exposure and turnover of the last backtest.
+
+        sharpe: annualized with the average number of bars per year of the data (no risk-free rate)
+        exposure: share of bars with an open position
+        turnover: traded value (all trades) relative to the average nav
+        '''
+        results = self.results
+        nav = results["nav"].to_numpy()
+        peak = np.maximum.accumulate(np.concatenate([[self.initial_balance], nav]))[1:]
+        strategy = results["strategy"].to_numpy()
+        years = (results.index[-1] - results.index[0]) / pd.Timedelta(days = 365.25)
+        bars_per_year = len(results) / years if years > 0 else np.nan
+        std = strategy.std(ddof = 1) if len(strategy) > 1 else np.nan
+        journal = self.journal
+        traded = np.sum(journal.units[:journal.length] * journal.price[:journal.length])
+        return pd.Series({"performance": nav[-1] / self.initial_balance,
+                          "max_drawdown": np.max(1 - nav / peak),
+                          "sharpe": strategy.mean() / std * np.sqrt(bars_per_year) if std > 0 else np.nan,
+                          "exposure": np.mean(results["position"].to_numpy() != 0),
+                          "turnover": traded / nav.mean(),
+                          "trades": journal.length})
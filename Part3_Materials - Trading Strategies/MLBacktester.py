@@ -4,6 +4,8 @@ import numpy as np
 from sklearn.linear_model import LogisticRegression
 from sklearn.multiclass import OneVsRestClassifier # added (from sklearn v. 1.7)
 import matplotlib.pyplot as plt
+from PriceStore import read_prices
+from BatchBacktest import bar_costs, cost_curve
 plt.style.use("seaborn-v0_8")
 
 class MLBacktester():
@@ -29,19 +31,34 @@ class MLBacktester():
         self.tc = tc
         self.model = OneVsRestClassifier(LogisticRegression(C = 1e6, max_iter = 100000)) # new (from sklearn v. 1.7)
         self.results = None
-        self.get_data()
+        self._data = None # imported lazily on first use, see preload()
     
     def __repr__(self):
         rep = "MLBacktester(symbol = {}, start = {}, end = {}, tc = {})"
         return rep.format(self.symbol, self.start, self.end, self.tc)
                              
+    @property
+    def data(self):
+        ''' Dataset (imported on first access).
+        '''
+        if self._data is None:
+            self.preload()
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+
+    def preload(self):
+        ''' Imports the data now instead of on first use (e.g. to pay the loading cost up front).
+        '''
+        if self._data is None:
+            self.get_data()
+
     def get_data(self):
         ''' Imports the data from five_minute_pairs.csv (source can be changed).
         '''
-        raw = pd.read_csv("five_minute_pairs.csv", parse_dates = ["time"], index_col = "time")
-        raw = raw[self.symbol].to_frame().dropna()
-        raw = raw.loc[self.start:self.end]
-        raw.rename(columns={self.symbol: "price"}, inplace=True)
+        raw = read_prices("five_minute_pairs.csv", self.symbol, self.start, self.end)
         raw["returns"] = np.log(raw / raw.shift(1))
         self.data = raw
                              
@@ -78,16 +95,8 @@ class MLBacktester():
         self.scale_features(recalc = True) # calculate mean & std of train set and scale train set
         self.model.fit(self.data_subset[self.feature_columns], np.sign(self.data_subset["returns"]))
         
-    def test_strategy(self, train_ratio = 0.7, lags = 5):
-        ''' 
-        Backtests the ML-based strategy.
-        
-        Parameters
-        ----------
-        train_ratio: float (between 0 and 1.0 excl.)
-            Splitting the dataset into training set (train_ratio) and test set (1 - train_ratio).
-        lags: int
-            number of lags serving as model features.
+    def predict_test_set(self, train_ratio = 0.7, lags = 5):
+        ''' Fits the model on the training set and returns the predictions (positions) for the test set (data_subset).
         '''
         self.lags = lags
                   
@@ -107,6 +116,32 @@ class MLBacktester():
                   
         # make predictions on the test set
         predict = self.model.predict(self.data_subset[self.feature_columns])
+        return predict
+        
+    def test_strategy(self, train_ratio = 0.7, lags = 5, metrics_only = False):
+        ''' 
+        Backtests the ML-based strategy.
+        
+        Parameters
+        ----------
+        train_ratio: float (between 0 and 1.0 excl.)
+            Splitting the dataset into training set (train_ratio) and test set (1 - train_ratio).
+        lags: int
+            number of lags serving as model features.
+        metrics_only: boolean (default = False)
+            if True, perf, outperf and the number of trades of the test set are computed on
+            NumPy arrays (fast path for optimizations); results is not updated
+        '''
+        predict = self.predict_test_set(train_ratio, lags)
+        
+        if metrics_only:
+            returns = self.data_subset["returns"].to_numpy()
+            trades = np.abs(np.diff(predict, prepend = predict[:1]))
+            strategy = predict * returns - trades * self.tc
+            perf = np.exp(np.cumsum(strategy)[-1])
+            outperf = perf - np.exp(np.cumsum(returns)[-1])
+            return round(perf, 6), round(outperf, 6), trades.sum()
+        
         self.data_subset["pred"] = predict
         
         # calculate Strategy Returns
@@ -128,6 +163,32 @@ class MLBacktester():
         
         return round(perf, 6), round(outperf, 6)
         
+    def tc_sweep(self, tc_values, train_ratio = 0.7, lags = 5, spread = None):
+        ''' Performance curve (test set) as a function of the proportional costs per trade (one pass over the predictions).
+
+        Parameters
+        ----------
+        tc_values: array-like
+            proportional costs per trade to be evaluated
+        train_ratio, lags:
+            see test_strategy
+        spread: float or Series (optional)
+            additional costs per trade: constant or schedule over time (e.g. half spread / price)
+
+        Returns
+        -------
+        curve: DataFrame
+            performance, outperformance and trades per tc
+        break_even: float
+            tc at which the strategy breaks even (performance = 1)
+        '''
+        predict = self.predict_test_set(train_ratio, lags)
+        returns = self.data_subset["returns"].to_numpy()
+        trades = np.abs(np.diff(predict, prepend = predict[:1]))
+        hold = np.exp(np.sum(returns))
+        costs = bar_costs(spread, self.data_subset.index)
+        return cost_curve(predict * returns, trades, hold, tc_values, costs)
+        
     def plot_results(self):
         ''' Plots the performance of the trading strategy and compares to "buy and hold".
         '''
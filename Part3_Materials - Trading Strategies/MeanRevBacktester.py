@@ -2,7 +2,15 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from PriceStore import read_prices
+from BarPyramid import get_bars
 from itertools import product
+from GridOptimizer import bollinger_grid, bollinger_grid_bands, rolling_means, rolling_stds, ffill
+from ResultCache import memoized
+from ParallelOptimizer import parallel_grid
+from WalkForward import walk_forward, bollinger_net_returns
+from BatchBacktest import price_matrix, summarize, performance, strategy_bars, bar_costs, cost_curve
+from ExecutionCosts import spread_array, spread_performance
 plt.style.use("seaborn-v0_8")
 
 
@@ -10,7 +18,7 @@ class MeanRevBacktester():
     ''' Class for the vectorized backtesting of Bollinger Bands-based trading strategies.
     '''
     
-    def __init__(self, symbol, SMA, dev, start, end, tc):
+    def __init__(self, symbol, SMA, dev, start, end, tc, bar_length = None, precision = "float64"):
         '''
         Parameters
         ----------
@@ -26,38 +34,64 @@ class MeanRevBacktester():
             end date for data import
         tc: float
             proportional transaction/trading costs per trade
+        bar_length: str (optional)
+            bar length (e.g. "20min", "4h", "1D") read from the cached bar pyramid instead of intraday_pairs.csv
+        precision: str (default "float64")
+            dtype of prices, returns and indicators ("float32" halves memory and bandwidth for large sweeps;
+            cumulative returns are always accumulated in float64)
         '''
         self.symbol = symbol
         self.SMA = SMA
         self.dev = dev
         self.start = start
         self.end = end
+        self.bar_length = bar_length
+        self.precision = precision
         self.tc = tc
         self.results = None
-        self.get_data()
-        self.prepare_data()
+        self._data = None # imported (and prepared) lazily on first use, see preload()
         
     def __repr__(self):
         rep = "MeanRevBacktester(symbol = {}, SMA = {}, dev = {}, start = {}, end = {})"
         return rep.format(self.symbol, self.SMA, self.dev, self.start, self.end)
         
+    @property
+    def data(self):
+        ''' Dataset (imported and prepared on first access).
+        '''
+        if self._data is None:
+            self.preload()
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+
+    def preload(self):
+        ''' Imports and prepares the data now instead of on first use (e.g. to pay the loading cost up front).
+        '''
+        if self._data is None:
+            self.get_data()
+            self.prepare_data()
+
     def get_data(self):
         ''' Imports the data from intraday_pairs.csv (source can be changed).
         '''
-        raw = pd.read_csv("intraday_pairs.csv", parse_dates = ["time"], index_col = "time")
-        raw = raw[self.symbol].to_frame().dropna()
-        raw = raw.loc[self.start:self.end]
-        raw.rename(columns={self.symbol: "price"}, inplace=True)
+        if self.bar_length is not None:
+            raw = get_bars(self.symbol, self.bar_length, self.start, self.end)
+        else:
+            raw = read_prices("intraday_pairs.csv", self.symbol, self.start, self.end)
         raw["returns"] = np.log(raw / raw.shift(1))
-        self.data = raw
+        self.data = raw.astype(self.precision, copy = False)
         
     def prepare_data(self):
         '''Prepares the data for strategy backtesting (strategy-specific).
         '''
         data = self.data.copy()
-        data["SMA"] = data["price"].rolling(self.SMA).mean()
-        data["Lower"] = data["SMA"] - data["price"].rolling(self.SMA).std() * self.dev
-        data["Upper"] = data["SMA"] + data["price"].rolling(self.SMA).std() * self.dev
+        std = data["price"].rolling(self.SMA).std()
+        data["SMA"] = data["price"].rolling(self.SMA).mean().astype(self.precision, copy = False)
+        data["Lower"] = (data["SMA"] - std * self.dev).astype(self.precision, copy = False)
+        data["Upper"] = (data["SMA"] + std * self.dev).astype(self.precision, copy = False)
         self.data = data
         
     def set_parameters(self, SMA = None, dev = None):
@@ -65,18 +99,41 @@ class MeanRevBacktester():
         '''
         if SMA is not None:
             self.SMA = SMA
-            self.data["SMA"] = self.data["price"].rolling(self.SMA).mean()
-            self.data["Lower"] = self.data["SMA"] - self.data["price"].rolling(self.SMA).std() * self.dev
-            self.data["Upper"] = self.data["SMA"] + self.data["price"].rolling(self.SMA).std() * self.dev
+            self.data["SMA"] = self.data["price"].rolling(self.SMA).mean().astype(self.precision, copy = False)
             
         if dev is not None:
             self.dev = dev
-            self.data["Lower"] = self.data["SMA"] - self.data["price"].rolling(self.SMA).std() * self.dev
-            self.data["Upper"] = self.data["SMA"] + self.data["price"].rolling(self.SMA).std() * self.dev
             
-    def test_strategy(self):
+        if SMA is not None or dev is not None: # rolling std only computed once
+            std = self.data["price"].rolling(self.SMA).std()
+            self.data["Lower"] = (self.data["SMA"] - std * self.dev).astype(self.precision, copy = False)
+            self.data["Upper"] = (self.data["SMA"] + std * self.dev).astype(self.precision, copy = False)
+            
+    def positions(self):
+        ''' Returns the positions and the complete rows (as arrays) of the prepared data.
+        '''
+        price, sma = self.data["price"].to_numpy(), self.data["SMA"].to_numpy()
+        valid = ~np.isnan(self.data.to_numpy(dtype = "float64")).any(axis = 1) # rows kept by dropna()
+        distance = np.where(valid, price - sma, np.nan)
+        position = np.where(price < self.data["Lower"].to_numpy(), 1, np.nan)
+        position = np.where(price > self.data["Upper"].to_numpy(), -1, position)
+        position[1:] = np.where(distance[1:] * distance[:-1] < 0, 0, position[1:])
+        return np.nan_to_num(ffill(position[:, None])[:, 0]), valid
+        
+    @memoized("SMA", "dev")
+    def test_strategy(self, metrics_only = False):
         ''' Backtests the Bollinger Bands-based trading strategy.
+
+        Parameters
+        ----------
+        metrics_only: boolean (default = False)
+            if True, perf, outperf and the number of trades are computed on NumPy arrays
+            (fast path for optimizations); results is not updated
         '''
+        if metrics_only:
+            position, valid = self.positions()
+            return performance(position, self.data["returns"].to_numpy(), valid, self.tc)
+        
         data = self.data.copy().dropna()
         data["distance"] = data.price - data.SMA
         data["position"] = np.where(data.price < data.Lower, 1, np.nan)
@@ -92,8 +149,8 @@ class MeanRevBacktester():
         # subtract transaction/trading costs from pre-cost return
         data.strategy = data.strategy - data.trades * self.tc
         
-        data["creturns"] = data["returns"].cumsum().apply(np.exp)
-        data["cstrategy"] = data["strategy"].cumsum().apply(np.exp)
+        data["creturns"] = data["returns"].astype("float64", copy = False).cumsum().apply(np.exp)
+        data["cstrategy"] = data["strategy"].astype("float64", copy = False).cumsum().apply(np.exp)
         self.results = data
        
         perf = data["cstrategy"].iloc[-1] # absolute performance of the strategy
@@ -101,6 +158,86 @@ class MeanRevBacktester():
         
         return round(perf, 6), round(outperf, 6)
     
+    @classmethod
+    def test_many(cls, symbols, SMA, dev, start, end, tc):
+        ''' Backtests the Bollinger Bands-based trading strategy for several symbols in one vectorized pass.
+
+        Indicators, positions and returns are computed on the (bars x symbols) price matrix
+        (see BatchBacktest). Results are the same as test_strategy() per symbol.
+
+        Parameters
+        ----------
+        symbols: list
+            ticker symbols (columns of intraday_pairs.csv)
+        SMA, dev, start, end, tc:
+            see MeanRevBacktester
+
+        Returns
+        -------
+        summary: DataFrame
+            performance, outperformance, trades and number of bars per symbol
+        '''
+        prices = price_matrix("intraday_pairs.csv", symbols, start, end)
+        returns = np.log(prices / prices.shift(1))
+        sma = prices.rolling(SMA).mean()
+        std = prices.rolling(SMA).std()
+        lower, upper = sma - std * dev, sma + std * dev
+        distance = prices - sma
+        position = np.where(prices < lower, 1, np.nan)
+        position = np.where(prices > upper, -1, position)
+        position = np.where(distance * distance.shift(1) < 0, 0, position)
+        position = pd.DataFrame(position).ffill().fillna(0)
+        valid = returns.notna() & lower.notna() & upper.notna()
+        return summarize(position, returns, valid, tc)
+    
+    def tc_sweep(self, tc_values, spread = None):
+        ''' Performance curve as a function of the proportional costs per trade (one pass over the positions).
+
+        Parameters
+        ----------
+        tc_values: array-like
+            proportional costs per trade to be evaluated
+        spread: float or Series (optional)
+            additional costs per trade: constant or schedule over time (e.g. half spread / price)
+
+        Returns
+        -------
+        curve: DataFrame
+            performance, outperformance and trades per tc
+        break_even: float
+            tc at which the strategy breaks even (performance = 1)
+        '''
+        position, valid = self.positions()
+        returns = self.data["returns"].to_numpy()
+        gross, trades, kept = strategy_bars(position, returns, valid)
+        hold = np.exp(np.sum(returns[1:][kept]))
+        costs = bar_costs(spread, self.data.index)
+        return cost_curve(gross, trades, hold, tc_values, costs if np.isscalar(costs) else costs[1:])
+    
+    def test_spread_costs(self, spread):
+        ''' Backtests the strategy with bid-ask spread costs filled like in IterativeBase (vectorized, see ExecutionCosts).
+
+        Trades are executed at the ask/bid price of the trade bar and the full balance is
+        invested in every position (no proportional tc).
+
+        Parameters
+        ----------
+        spread: float or Series
+            absolute bid-ask spread: constant or per bar (e.g. the spread column of detailed.csv)
+
+        Returns
+        -------
+        perf, outperf: float
+            absolute performance and out-/underperformance of the strategy (rounded like test_strategy)
+        trades: int
+            number of trades (incl. closing the final position)
+        '''
+        position, valid = self.positions()
+        price = self.data["price"].to_numpy()
+        perf, trades = spread_performance(position, price, spread_array(spread, self.data.index), valid)
+        hold = price[valid][-1] / price[valid][0] # buy and hold over the same bars
+        return round(perf, 6), round(perf - hold, 6), trades
+    
     def plot_results(self):
         ''' Plots the performance of the trading strategy and compares to "buy and hold".
         '''
@@ -110,22 +247,38 @@ class MeanRevBacktester():
             title = "{} | SMA = {} | dev = {} | TC = {}".format(self.symbol, self.SMA, self.dev, self.tc)
             self.results[["creturns", "cstrategy"]].plot(title=title, figsize=(12, 8))     
    
-    def optimize_parameters(self, SMA_range, dev_range):
+    def optimize_parameters(self, SMA_range, dev_range, vectorized = True, processes = 1):
         ''' Finds the optimal strategy (global maximum) given the Bollinger Bands parameter ranges.
 
         Parameters
         ----------
         SMA_range, dev_range: tuple
             tuples of the form (start, end, step size)
+        vectorized: boolean (default = True)
+            whether all dev values are scored at once per SMA (GridOptimizer.bollinger_grid)
+            instead of running test_strategy() for each combination
+        processes: int (default 1)
+            number of worker processes scoring the vectorized grid (None: all cores, see ParallelOptimizer)
         '''
         
         combinations = list(product(range(*SMA_range), range(*dev_range)))
         
         # test all combinations
-        results = []
-        for comb in combinations:
-            self.set_parameters(comb[0], comb[1])
-            results.append(self.test_strategy()[0])
+        if vectorized:
+            arrays = [self.data["price"], self.data["returns"]]
+            if processes == 1:
+                perf = bollinger_grid(*arrays, range(*SMA_range), range(*dev_range), self.tc)
+            else:
+                smas = rolling_means(self.data["price"], range(*SMA_range)) # computed once, shared with the workers
+                stds = rolling_stds(self.data["price"], range(*SMA_range))
+                perf = parallel_grid(bollinger_grid_bands, arrays + [smas, stds], range(*SMA_range), range(*dev_range),
+                                     self.tc, split = (2, 3), processes = processes)
+            results = list(np.round(perf.ravel(), 6))
+        else:
+            results = []
+            for comb in combinations:
+                self.set_parameters(comb[0], comb[1])
+                results.append(self.test_strategy(metrics_only = True)[0])
         
         best_perf = np.max(results) # best performance
         opt = combinations[np.argmax(results)] # optimal parameters
@@ -140,4 +293,25 @@ class MeanRevBacktester():
         self.results_overview = many_results
                             
         return opt, best_perf
-    
\ No newline at end of file
+    
+
+    def walk_forward(self, SMA_range, dev_range, in_sample, out_sample):
+        ''' Walk-forward optimization: rolling in-sample optimization with out-of-sample tests (see WalkForward).
+
+        Parameters
+        ----------
+        SMA_range, dev_range: tuple
+            tuples of the form (start, end, step size)
+        in_sample, out_sample: int
+            number of bars of the in-sample and out-of-sample windows
+
+        Returns
+        -------
+        folds: DataFrame
+            windows, optimal parameters and in-/out-of-sample performance of each fold
+        results: DataFrame
+            stitched out-of-sample performance
+        '''
+        values1, values2 = range(*SMA_range), range(*dev_range)
+        return walk_forward(bollinger_net_returns, self.data["price"], self.data["returns"], values1, values2, in_sample, out_sample,
+                            self.tc, warmup = max(values1), names = ("SMA", "dev"))
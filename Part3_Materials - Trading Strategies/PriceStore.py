@@ -0,0 +1,133 @@
+import os
+import pandas as pd
+import numpy as np
+from DataCache import cache_path, read_meta, build_cache_chunked, load_columns, to_datetime_index, read_csv_window
+
+
+class PriceStore():
+    ''' Memory-mapped, per-symbol price store for (multi-symbol) csv files like intraday_pairs.csv.
+
+    Each symbol is kept as its own memory-mapped float64 array next to a sorted int64
+    timestamp array (the columnar cache of DataCache). start/end are resolved with binary
+    search (searchsorted), so a backtest over a narrow window only touches the pages it
+    needs and the history can be many times larger than RAM.
+    '''
+
+    def __init__(self, filepath, index_col = "time", chunksize = 500000):
+        '''
+        Parameters
+        ----------
+        filepath: str
+            path to the csv file (converted once into the columnar cache)
+        index_col: str
+            name of the datetime column
+        chunksize: int
+            number of rows parsed at once when (re-)building the cache
+        '''
+        self.filepath = filepath
+        self.index_col = index_col
+        self.chunksize = chunksize
+        self.meta = None
+        self.open()
+
+    def __repr__(self):
+        return "PriceStore(filepath = {}, symbols = {})".format(self.filepath, self.symbols)
+
+    def open(self, attempts = 5):
+        ''' Memory-maps the timestamp and symbol arrays (building/refreshing the cache if required).
+
+        All arrays are mapped at once, so the store stays consistent even if another process
+        rebuilds the cache later (mapped files remain valid after they are replaced).
+        '''
+        for attempt in range(attempts):
+            meta = read_meta(self.filepath, index_col = self.index_col)
+            if meta is None or not meta.get("sorted"):
+                meta = build_cache_chunked(self.filepath, self.index_col, self.chunksize)
+            arrays = load_columns(self.filepath, meta, mmap_mode = "r")
+            if arrays is not None:
+                break
+        else:
+            raise OSError("The cache of {} was replaced while opening it (retried {} times).".format(self.filepath, attempts))
+        self.meta = meta
+        self.path = cache_path(self.filepath)
+        self.symbols = meta["columns"]
+        self.stamps, columns = arrays
+        self.columns = dict(zip(self.symbols, columns))
+
+    def refresh(self):
+        ''' Re-opens the store if the csv file has changed since it was opened.
+        '''
+        if read_meta(self.filepath, index_col = self.index_col) != self.meta:
+            self.open()
+
+    def column(self, symbol):
+        ''' Returns the memory-mapped array of a symbol.
+        '''
+        if symbol not in self.columns:
+            raise KeyError("{} not in {}".format(symbol, self.filepath))
+        return self.columns[symbol]
+
+    def to_stamp(self, date, end = False):
+        ''' Converts a start/end date into epoch-ns (same semantics as .loc[start:end]).
+
+        Partial date strings are expanded like in pandas, e.g. end = "2019-06" includes the whole of June.
+        '''
+        ts = pd.Timestamp(date)
+        if end and isinstance(date, str) and ts.tzinfo is None:
+            ts = pd.Period(date).end_time
+        if self.meta["tz"] is not None and ts.tzinfo is None:
+            ts = ts.tz_localize(self.meta["tz"])
+        elif self.meta["tz"] is None and ts.tzinfo is not None:
+            ts = ts.tz_convert("UTC").tz_localize(None)
+        return ts.as_unit("ns").value
+
+    def locate(self, start = None, end = None):
+        ''' Returns the positions [first, last) of the bars between start and end (inclusive).
+        '''
+        first = 0 if start is None else int(np.searchsorted(self.stamps, self.to_stamp(start), side = "left"))
+        last = len(self.stamps) if end is None else int(np.searchsorted(self.stamps, self.to_stamp(end, True), side = "right"))
+        return first, max(first, last)
+
+    def index(self, first, last):
+        ''' Returns the DatetimeIndex of the bars [first, last).
+        '''
+        return to_datetime_index(self.stamps[first:last], self.meta)
+
+    def get(self, symbol, start = None, end = None):
+        ''' Returns the prices of a symbol between start and end as DataFrame with a "price" column.
+
+        Equivalent to raw[symbol].to_frame().dropna().loc[start:end] (with the symbol column renamed to "price").
+        '''
+        first, last = self.locate(start, end)
+        values = self.column(symbol)[first:last]
+        prices = pd.Series(values, index = self.index(first, last), name = "price")
+        return prices.dropna().to_frame()
+
+
+def read_prices(filepath, symbol, start = None, end = None, index_col = "time", cache = True):
+    ''' Returns the prices of a symbol between start and end as DataFrame with a "price" column.
+
+    Reads through the memory-mapped PriceStore (the columnar cache is built on first use).
+    With cache = False, or if the cache can't be written (e.g. read-only data directory),
+    the csv file is streamed with DataCache.read_csv_window instead: only the index and the
+    symbol column are parsed and reading stops after end.
+
+    Parameters
+    ----------
+    filepath: str
+        path to the csv file
+    symbol: str
+        column to be imported
+    start, end: str
+        first and last date (inclusive)
+    index_col: str
+        name of the datetime column
+    cache: boolean (default = True)
+        whether the columnar cache is used (and built if required)
+    '''
+    if cache:
+        try:
+            return PriceStore(filepath, index_col = index_col).get(symbol, start, end)
+        except OSError: # e.g. read-only data directory -> stream the csv file
+            pass
+    return read_csv_window(filepath, symbol, start, end, index_col)
@@ -0,0 +1,200 @@
+import os
+import zlib
+import pickle
+import hashlib
+import inspect
+import numbers
+import functools
+from collections import OrderedDict
+import pandas as pd
+
+
+class ResultCache():
+    ''' LRU cache of backtest results (perf, outperf and optionally the compressed results frame).
+
+    Entries are evicted (least recently used first) as soon as the cached bytes exceed max_bytes.
+    With disk_dir, every entry is also written to disk, so results survive process restarts
+    (the disk tier is not size-limited; use clear() to empty it).
+    '''
+
+    def __init__(self, max_bytes = 256 * 2**20, disk_dir = None, keep_results = False):
+        '''
+        Parameters
+        ----------
+        max_bytes: int
+            size cap of the in-memory tier
+        disk_dir: str (optional)
+            folder of the on-disk tier
+        keep_results: boolean
+            whether the results frame is cached as well (compressed); if not, a
+            cache hit re-runs test_strategy() to rebuild results (see memoized)
+        '''
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.keep_results = keep_results
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return "ResultCache(entries = {}, nbytes = {}, hits = {}, misses = {})".format(
+            len(self.entries), self.nbytes, self.hits, self.misses)
+
+    def disk_path(self, key):
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.disk_dir, name + ".pkl")
+
+    def get(self, key):
+        ''' Returns the entry (perf, outperf, compressed results or None) of key (None if not cached).
+        '''
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        elif self.disk_dir is not None and os.path.exists(self.disk_path(key)):
+            stored_key = None
+            try:
+                with open(self.disk_path(key), "rb") as f:
+                    stored_key, entry = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                entry = None
+            if stored_key != key: # (very unlikely) hash collision
+                entry = None
+            if entry is not None:
+                self.add(key, entry)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, key, perf, outperf, results = None):
+        ''' Caches the performance (and the results frame, if keep_results) of key.
+        '''
+        blob = None
+        if self.keep_results and results is not None:
+            blob = zlib.compress(pickle.dumps(results, protocol = pickle.HIGHEST_PROTOCOL), 1)
+        entry = (perf, outperf, blob)
+        self.add(key, entry)
+        if self.disk_dir is not None:
+            os.makedirs(self.disk_dir, exist_ok = True)
+            path = self.disk_path(key)
+            tmp = path + ".tmp{}".format(os.getpid()) # per process: concurrent writers of the same key
+            with open(tmp, "wb") as f:
+                pickle.dump((key, entry), f, protocol = pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path) # atomic: no partial files for concurrent readers
+
+    def add(self, key, entry):
+        if key in self.entries:
+            self.nbytes -= self.entry_size(self.entries.pop(key))
+        self.entries[key] = entry
+        self.nbytes += self.entry_size(entry)
+        while self.nbytes > self.max_bytes and self.entries:
+            self.nbytes -= self.entry_size(self.entries.popitem(last = False)[1])
+
+    @staticmethod
+    def entry_size(entry):
+        return 100 + (len(entry[2]) if entry[2] is not None else 0) # approx. overhead of key and tuple
+
+    @staticmethod
+    def load_results(entry):
+        ''' Returns the results frame of an entry (None if it wasn't kept).
+        '''
+        if entry[2] is None:
+            return None
+        return pickle.loads(zlib.decompress(entry[2]))
+
+    def clear(self, disk = False):
+        ''' Empties the in-memory tier (and the on-disk tier if disk = True).
+        '''
+        self.entries.clear()
+        self.nbytes = 0
+        if disk and self.disk_dir is not None and os.path.isdir(self.disk_dir):
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".pkl"):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+
+result_cache = None # disabled until enable_result_cache() is called
+
+
+def enable_result_cache(max_bytes = 256 * 2**20, disk_dir = None, keep_results = False):
+    ''' Enables memoization of test_strategy() for all backtesters (see ResultCache).
+    '''
+    global result_cache
+    result_cache = ResultCache(max_bytes, disk_dir, keep_results)
+    return result_cache
+
+
+def disable_result_cache():
+    global result_cache
+    result_cache = None
+
+
+def data_hash(backtester):
+    ''' Content hash of the prices of a backtester (computed once per dataset).
+    '''
+    data = backtester.data
+    stamp = backtester.__dict__.get("_data_hash")
+    if stamp is None or stamp[0] is not data:
+        digest = hashlib.sha1(pd.util.hash_pandas_object(data["price"]).to_numpy().tobytes()).hexdigest()
+        stamp = backtester._data_hash = (data, digest)
+    return stamp[1]
+
+
+def canonical(value):
+    ''' Canonical form of a key component (e.g. 50, 50.0 and np.int64(50) are the same parameter).
+    '''
+    if isinstance(value, numbers.Number):
+        return float(value)
+    return str(value)
+
+
+def memoized(*parameters):
+    ''' Decorator memoizing test_strategy() while a result cache is enabled (see enable_result_cache).
+
+    The key consists of the class, symbol, start, end, tc, bar_length, precision, the
+    strategy parameters and a content hash of the prices. Parameters are taken from the
+    arguments of the method if it has one of that name (and then stored on the instance,
+    like test_strategy does), else from the instance attributes. A hit without a stored
+    results frame (keep_results = False) re-runs the method, so that results always
+    belongs to the returned performance (e.g. for plot_results()).
+
+    Parameters
+    ----------
+    parameters: str
+        names of the strategy parameters (e.g. "SMA_S", "SMA_L")
+    '''
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache = result_cache
+            if cache is None:
+                return method(self, *args, **kwargs)
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            if bound.arguments.get("metrics_only"): # fast path, nothing worth caching
+                return method(self, *args, **kwargs)
+            values = [bound.arguments[name] if name in bound.arguments else getattr(self, name)
+                      for name in parameters]
+            key = (type(self).__name__,) + tuple(canonical(getattr(self, attr, None)) for attr in
+                   ["symbol", "start", "end", "tc", "bar_length", "precision"])
+            key += tuple(canonical(value) for value in values) + (data_hash(self),)
+
+            entry = cache.get(key)
+            if entry is None:
+                perf, outperf = method(self, *args, **kwargs)
+                cache.put(key, perf, outperf, self.results)
+                return perf, outperf
+            if entry[2] is None: # no results frame stored: rebuild results
+                method(self, *args, **kwargs)
+                return entry[0], entry[1]
+            for name, value in zip(parameters, values):
+                if name in bound.arguments:
+                    setattr(self, name, value)
+            self.results = cache.load_results(entry)
+            return entry[0], entry[1]
+        return wrapper
+    return decorator
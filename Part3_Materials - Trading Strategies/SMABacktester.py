@@ -2,7 +2,15 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from PriceStore import read_prices
+from BarPyramid import get_bars
 from itertools import product
+from GridOptimizer import sma_grid, sma_grid_means, rolling_means
+from ResultCache import memoized
+from ParallelOptimizer import parallel_grid
+from WalkForward import walk_forward, sma_net_returns
+from BatchBacktest import price_matrix, summarize, performance
+from ExecutionCosts import spread_array, spread_performance
 plt.style.use("seaborn-v0_8")
 
 
@@ -10,7 +18,7 @@ class SMABacktester():
     ''' Class for the vectorized backtesting of SMA-based trading strategies.
     '''
     
-    def __init__(self, symbol, SMA_S, SMA_L, start, end):
+    def __init__(self, symbol, SMA_S, SMA_L, start, end, bar_length = None, precision = "float64"):
         '''
         Parameters
         ----------
@@ -24,35 +32,60 @@ class SMABacktester():
             start date for data import
         end: str
             end date for data import
+        bar_length: str (optional)
+            bar length (e.g. "20min", "4h", "1D") read from the cached bar pyramid instead of forex_pairs.csv
+        precision: str (default "float64")
+            dtype of prices, returns and indicators ("float32" halves memory and bandwidth for large sweeps;
+            cumulative returns are always accumulated in float64)
         '''
         self.symbol = symbol
         self.SMA_S = SMA_S
         self.SMA_L = SMA_L
         self.start = start
         self.end = end
+        self.bar_length = bar_length
+        self.precision = precision
         self.results = None 
-        self.get_data()
-        self.prepare_data()
+        self._data = None # imported (and prepared) lazily on first use, see preload()
         
     def __repr__(self):
         return "SMABacktester(symbol = {}, SMA_S = {}, SMA_L = {}, start = {}, end = {})".format(self.symbol, self.SMA_S, self.SMA_L, self.start, self.end)
         
+    @property
+    def data(self):
+        ''' Dataset (imported and prepared on first access).
+        '''
+        if self._data is None:
+            self.preload()
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+
+    def preload(self):
+        ''' Imports and prepares the data now instead of on first use (e.g. to pay the loading cost up front).
+        '''
+        if self._data is None:
+            self.get_data()
+            self.prepare_data()
+
     def get_data(self):
         ''' Imports the data from forex_pairs.csv (source can be changed).
         '''
-        raw = pd.read_csv("forex_pairs.csv", parse_dates = ["Date"], index_col = "Date")
-        raw = raw[self.symbol].to_frame().dropna()
-        raw = raw.loc[self.start:self.end].copy()
-        raw.rename(columns={self.symbol: "price"}, inplace=True)
+        if self.bar_length is not None:
+            raw = get_bars(self.symbol, self.bar_length, self.start, self.end)
+        else:
+            raw = read_prices("forex_pairs.csv", self.symbol, self.start, self.end, index_col = "Date")
         raw["returns"] = np.log(raw / raw.shift(1))
-        self.data = raw
+        self.data = raw.astype(self.precision, copy = False)
         
     def prepare_data(self):
         '''Prepares the data for strategy backtesting (strategy-specific).
         '''
         data = self.data.copy()
-        data["SMA_S"] = data["price"].rolling(self.SMA_S).mean()
-        data["SMA_L"] = data["price"].rolling(self.SMA_L).mean()
+        data["SMA_S"] = data["price"].rolling(self.SMA_S).mean().astype(self.precision, copy = False)
+        data["SMA_L"] = data["price"].rolling(self.SMA_L).mean().astype(self.precision, copy = False)
         self.data = data
         
     def set_parameters(self, SMA_S = None, SMA_L = None):
@@ -60,26 +93,95 @@ class SMABacktester():
         '''
         if SMA_S is not None:
             self.SMA_S = SMA_S
-            self.data["SMA_S"] = self.data["price"].rolling(self.SMA_S).mean()
+            self.data["SMA_S"] = self.data["price"].rolling(self.SMA_S).mean().astype(self.precision, copy = False)
         if SMA_L is not None:
             self.SMA_L = SMA_L
-            self.data["SMA_L"] = self.data["price"].rolling(self.SMA_L).mean()
+            self.data["SMA_L"] = self.data["price"].rolling(self.SMA_L).mean().astype(self.precision, copy = False)
+            
+    def positions(self):
+        ''' Returns the positions and the complete rows (as arrays) of the prepared data.
+        '''
+        sma_s, sma_l = self.data["SMA_S"].to_numpy(), self.data["SMA_L"].to_numpy()
+        valid = ~np.isnan(self.data.to_numpy(dtype = "float64")).any(axis = 1) # rows kept by dropna()
+        return np.where(sma_s > sma_l, 1, -1), valid
             
-    def test_strategy(self):
+    @memoized("SMA_S", "SMA_L")
+    def test_strategy(self, metrics_only = False):
         ''' Backtests the SMA-based trading strategy.
+
+        Parameters
+        ----------
+        metrics_only: boolean (default = False)
+            if True, perf, outperf and the number of trades are computed on NumPy arrays
+            (fast path for optimizations); results is not updated
         '''
+        if metrics_only:
+            position, valid = self.positions()
+            return performance(position, self.data["returns"].to_numpy(), valid)
+        
         data = self.data.copy().dropna()
         data["position"] = np.where(data["SMA_S"] > data["SMA_L"], 1, -1)
         data["strategy"] = data["position"].shift(1) * data["returns"]
         data.dropna(inplace=True)
-        data["creturns"] = data["returns"].cumsum().apply(np.exp)
-        data["cstrategy"] = data["strategy"].cumsum().apply(np.exp)
+        data["creturns"] = data["returns"].astype("float64", copy = False).cumsum().apply(np.exp)
+        data["cstrategy"] = data["strategy"].astype("float64", copy = False).cumsum().apply(np.exp)
         self.results = data
        
         perf = data["cstrategy"].iloc[-1] # absolute performance of the strategy
         outperf = perf - data["creturns"].iloc[-1] # out-/underperformance of strategy
         return round(perf, 6), round(outperf, 6)
     
+    @classmethod
+    def test_many(cls, symbols, SMA_S, SMA_L, start, end):
+        ''' Backtests the SMA-based trading strategy for several symbols in one vectorized pass.
+
+        Indicators, positions and returns are computed on the (bars x symbols) price matrix
+        (see BatchBacktest). Results are the same as test_strategy() per symbol.
+
+        Parameters
+        ----------
+        symbols: list
+            ticker symbols (columns of forex_pairs.csv)
+        SMA_S, SMA_L, start, end:
+            see SMABacktester
+
+        Returns
+        -------
+        summary: DataFrame
+            performance, outperformance, trades and number of bars per symbol
+        '''
+        prices = price_matrix("forex_pairs.csv", symbols, start, end, index_col = "Date")
+        returns = np.log(prices / prices.shift(1))
+        sma_s = prices.rolling(SMA_S).mean()
+        sma_l = prices.rolling(SMA_L).mean()
+        position = np.where(sma_s > sma_l, 1, -1)
+        valid = returns.notna() & sma_s.notna() & sma_l.notna()
+        return summarize(position, returns, valid)
+    
+    def test_spread_costs(self, spread):
+        ''' Backtests the strategy with bid-ask spread costs filled like in IterativeBase (vectorized, see ExecutionCosts).
+
+        Trades are executed at the ask/bid price of the trade bar and the full balance is
+        invested in every position (no proportional tc).
+
+        Parameters
+        ----------
+        spread: float or Series
+            absolute bid-ask spread: constant or per bar (e.g. the spread column of detailed.csv)
+
+        Returns
+        -------
+        perf, outperf: float
+            absolute performance and out-/underperformance of the strategy (rounded like test_strategy)
+        trades: int
+            number of trades (incl. closing the final position)
+        '''
+        position, valid = self.positions()
+        price = self.data["price"].to_numpy()
+        perf, trades = spread_performance(position, price, spread_array(spread, self.data.index), valid)
+        hold = price[valid][-1] / price[valid][0] # buy and hold over the same bars
+        return round(perf, 6), round(perf - hold, 6), trades
+    
     def plot_results(self):
         ''' Plots the performance of the trading strategy and compares to "buy and hold".
         '''
@@ -89,22 +191,38 @@ class SMABacktester():
             title = "{} | SMA_S = {} | SMA_L = {}".format(self.symbol, self.SMA_S, self.SMA_L)
             self.results[["creturns", "cstrategy"]].plot(title=title, figsize=(12, 8))
     
-    def optimize_parameters(self, SMA_S_range, SMA_L_range):
+    def optimize_parameters(self, SMA_S_range, SMA_L_range, vectorized = True, processes = 1):
         ''' Finds the optimal strategy (global maximum) given the SMA parameter ranges.
 
         Parameters
         ----------
         SMA_S_range, SMA_L_range: tuple
             tuples of the form (start, end, step size)
+        vectorized: boolean (default = True)
+            whether all combinations are scored at once (GridOptimizer.sma_grid)
+            instead of running test_strategy() for each combination
+        processes: int (default 1)
+            number of worker processes scoring the vectorized grid (None: all cores, see ParallelOptimizer)
         '''
         
         combinations = list(product(range(*SMA_S_range), range(*SMA_L_range)))
         
         # test all combinations
-        results = []
-        for comb in combinations:
-            self.set_parameters(comb[0], comb[1])
-            results.append(self.test_strategy()[0])
+        if vectorized:
+            arrays = [self.data["price"], self.data["returns"]]
+            if processes == 1:
+                perf = sma_grid(*arrays, range(*SMA_S_range), range(*SMA_L_range))
+            else:
+                sma_s = rolling_means(self.data["price"], range(*SMA_S_range)) # computed once, shared with the workers
+                sma_l = rolling_means(self.data["price"], range(*SMA_L_range))
+                perf = parallel_grid(sma_grid_means, [self.data["returns"], sma_s, sma_l], range(*SMA_S_range),
+                                     range(*SMA_L_range), split = (1,), processes = processes)
+            results = list(np.round(perf.ravel(), 6))
+        else:
+            results = []
+            for comb in combinations:
+                self.set_parameters(comb[0], comb[1])
+                results.append(self.test_strategy(metrics_only = True)[0])
         
         best_perf = np.max(results) # best performance
         opt = combinations[np.argmax(results)] # optimal parameters
@@ -120,4 +238,25 @@ class SMABacktester():
                             
         return opt, best_perf
         
-     
\ No newline at end of file
+     
+
+    def walk_forward(self, SMA_S_range, SMA_L_range, in_sample, out_sample):
+        ''' Walk-forward optimization: rolling in-sample optimization with out-of-sample tests (see WalkForward).
+
+        Parameters
+        ----------
+        SMA_S_range, SMA_L_range: tuple
+            tuples of the form (start, end, step size)
+        in_sample, out_sample: int
+            number of bars of the in-sample and out-of-sample windows
+
+        Returns
+        -------
+        folds: DataFrame
+            windows, optimal parameters and in-/out-of-sample performance of each fold
+        results: DataFrame
+            stitched out-of-sample performance
+        '''
+        values1, values2 = range(*SMA_S_range), range(*SMA_L_range)
+        return walk_forward(sma_net_returns, self.data["price"], self.data["returns"], values1, values2, in_sample, out_sample,
+                            0.0, warmup = max(max(values1), max(values2)), names = ("SMA_S", "SMA_L"))
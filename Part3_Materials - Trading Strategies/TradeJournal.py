@@ -0,0 +1,86 @@
+import pandas as pd
+import numpy as np
+
+
+# verbosity levels of the iterative backtesters
+SILENT = 0 # no output
+SUMMARY = 1 # header and final summary of a backtest
+TRADES = 2 # every trade (default, as before)
+
+
+class TradeJournal():
+    ''' Preallocated, array-backed journal of the trades of an iterative backtest.
+
+    Every trade is one row (bar, side, units, price, spread cost, balance) written into
+    NumPy arrays that grow by doubling; nothing is formatted while the backtest runs.
+    Export the trades in bulk with to_frame() or to_csv() when the run ends.
+    '''
+
+    columns = ["bar", "side", "units", "price", "spread_cost", "balance"]
+
+    def __init__(self, capacity = 1024):
+        '''
+        Parameters
+        ----------
+        capacity: int
+            number of trades preallocated (grows automatically)
+        '''
+        self.length = 0
+        self.allocate(capacity)
+
+    def __repr__(self):
+        return "TradeJournal(trades = {})".format(self.length)
+
+    def __len__(self):
+        return self.length
+
+    def allocate(self, capacity):
+        ''' (Re-)allocates the arrays with the given capacity, keeping the recorded trades.
+        '''
+        arrays = {"bar": np.empty(capacity, dtype = "int64"), "side": np.empty(capacity, dtype = "int8")}
+        for column in ["units", "price", "spread_cost", "balance"]:
+            arrays[column] = np.empty(capacity, dtype = "float64")
+        if self.length:
+            for column, array in arrays.items():
+                array[:self.length] = getattr(self, column)[:self.length]
+        for column, array in arrays.items():
+            setattr(self, column, array)
+        self.capacity = capacity
+
+    def reserve(self, capacity):
+        ''' Makes sure that capacity trades fit without reallocation (e.g. the number of bars).
+        '''
+        if capacity > self.capacity:
+            self.allocate(capacity)
+
+    def reset(self):
+        ''' Removes all trades (keeps the allocated arrays).
+        '''
+        self.length = 0
+
+    def record(self, bar, side, units, price, spread_cost, balance):
+        ''' Records a trade (side: 1 = buy, -1 = sell; price: execution price incl. half spread).
+        '''
+        i = self.length
+        if i == self.capacity:
+            self.allocate(2 * self.capacity)
+        self.bar[i] = bar
+        self.side[i] = side
+        self.units[i] = units
+        self.price[i] = price
+        self.spread_cost[i] = spread_cost
+        self.balance[i] = balance
+        self.length = i + 1
+
+    def to_frame(self, index = None):
+        ''' Returns the trades as DataFrame (with the times of the bars if index is passed).
+        '''
+        frame = pd.DataFrame({column: getattr(self, column)[:self.length].copy() for column in self.columns})
+        if index is not None:
+            frame.index = index[frame["bar"].to_numpy()]
+        return frame
+
+    def to_csv(self, path, index = None):
+        ''' Writes the trades to a csv file.
+        '''
+        self.to_frame(index).to_csv(path)
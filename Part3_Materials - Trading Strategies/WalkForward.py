@@ -0,0 +1,136 @@
+import pandas as pd
+import numpy as np
+from GridOptimizer import rolling_means, rolling_stds, ffill
+
+
+def net_returns(position, returns, tc):
+    ''' Strategy log returns (after costs) per bar for a (bars x combinations) position matrix.
+
+    Bar t earns position(t-1) * returns(t) and pays tc per unit of position change in t.
+    '''
+    net = np.zeros(position.shape)
+    net[1:] = position[:-1] * returns[1:, None] - tc * np.abs(np.diff(position, axis = 0))
+    return net
+
+
+def sma_net_returns(price, returns, SMA_S_values, SMA_L_values, tc = 0.0):
+    ''' Yields (i, net returns, first valid bar, positions) of the SMA crossover strategy for SMA_S_values[i] and all SMA_L_values.
+
+    Indicators are computed once on the full history (see SMABacktester.test_strategy for the logic).
+    '''
+    sma_s = rolling_means(price, SMA_S_values)
+    sma_l = rolling_means(price, SMA_L_values)
+    for i, S in enumerate(SMA_S_values):
+        first = np.maximum(S, np.asarray(SMA_L_values)) - 1
+        valid = ~np.isnan(sma_s[:, i:i + 1]) & ~np.isnan(sma_l)
+        position = np.where(valid, np.where(sma_s[:, i:i + 1] > sma_l, 1.0, -1.0), 0.0)
+        yield i, net_returns(position, returns, tc), first, position
+
+
+def bollinger_net_returns(price, returns, SMA_values, dev_values, tc = 0.0):
+    ''' Yields (i, net returns, first valid bar, positions) of the Bollinger Bands strategy for SMA_values[i] and all dev_values.
+
+    Indicators are computed once on the full history (see MeanRevBacktester.test_strategy for the logic).
+    '''
+    smas = rolling_means(price, SMA_values)
+    stds = rolling_stds(price, SMA_values)
+    dev_values = np.asarray(dev_values)
+    for i, SMA in enumerate(SMA_values):
+        sma, std = smas[:, i:i + 1], stds[:, i:i + 1]
+        distance = price - sma[:, 0]
+        signals = np.full((len(price), len(dev_values)), np.nan)
+        signals[price[:, None] < sma - std * dev_values] = 1
+        signals[price[:, None] > sma + std * dev_values] = -1
+        signals[1:][distance[1:] * distance[:-1] < 0] = 0
+        position = np.nan_to_num(ffill(signals))
+        first = np.full(len(dev_values), SMA - 1 if SMA > 1 else len(price)) # std needs two bars
+        yield i, net_returns(position, returns, tc), first, position
+
+
+def fold_bounds(bars, in_sample, out_sample, warmup = 0):
+    ''' Returns the folds (in-sample start, out-of-sample start, out-of-sample end) as bar positions.
+
+    The first in-sample window starts after warmup bars. Each in-sample window has in_sample
+    bars and is followed by out_sample bars; the next fold starts out_sample bars later,
+    so that the out-of-sample windows don't overlap.
+    '''
+    starts = np.arange(warmup + in_sample, bars, out_sample)
+    return [(b - in_sample, b, min(b + out_sample, bars)) for b in starts]
+
+
+def walk_forward(strategy, price, returns, values1, values2, in_sample, out_sample, tc = 0.0, warmup = 0, names = ("param1", "param2")):
+    ''' Rolling in-sample optimization with out-of-sample tests for all folds in one pass over the grid.
+
+    The net returns of all combinations are computed once on the full history (one block
+    per value of the first parameter). Their cumulative sums turn the in-sample performance
+    of every combination in every fold into a difference of two array entries, so the cost
+    after the one-off preparation grows with folds x grid size. Positions carry over fold
+    boundaries (i.e. indicator state comes from the full history). Switching from the
+    position of the previous fold's combination to the one of the new combination at the
+    last bar before a fold costs tc per unit of change (charged to the first out-of-sample
+    bar of the fold, like a trade in net_returns).
+
+    Parameters
+    ----------
+    strategy: function
+        sma_net_returns or bollinger_net_returns
+    price, returns: Series
+        prices and log returns (first return NaN)
+    values1, values2: array-like
+        grid of the two strategy parameters
+    in_sample, out_sample: int
+        number of bars of the in-sample and out-of-sample windows
+    tc: float
+        proportional transaction costs per trade
+    warmup: int
+        number of bars before the first in-sample window (e.g. the longest SMA window,
+        so that all combinations can be scored in all folds)
+    names: tuple
+        names of the two parameters (columns of the folds overview)
+
+    Returns
+    -------
+    folds: DataFrame
+        in-sample/out-of-sample windows, optimal parameters and performances of each fold
+    results: DataFrame
+        stitched out-of-sample returns (returns, strategy) and cumulative performances (creturns, cstrategy)
+    '''
+    index = price.index
+    price = np.asarray(price, dtype = "float64")
+    returns = np.nan_to_num(np.asarray(returns, dtype = "float64"))
+    values1, values2 = np.asarray(values1), np.asarray(values2)
+    bounds = fold_bounds(len(price), in_sample, out_sample, warmup)
+    if not bounds:
+        raise ValueError("Not enough bars for one fold (warmup = {}, in_sample = {}).".format(warmup, in_sample))
+    a, b, c = (np.array(x) for x in zip(*bounds))
+
+    best = np.full(len(bounds), -np.inf) # best in-sample log return per fold
+    best_params = [(np.nan, np.nan)] * len(bounds)
+    oos = [None] * len(bounds) # out-of-sample net returns of the best combination per fold
+    held = np.zeros((len(bounds), 2)) # position of the best combination before / at the end of the out-of-sample window
+    for i, net, first, position in strategy(price, returns, values1, values2, tc):
+        cum = np.vstack([np.zeros(net.shape[1]), np.cumsum(net, axis = 0)]) # cum[t] = sum of net[:t]
+        scores = cum[b] - cum[a] # (folds x values2)
+        scores[first[None, :] >= a[:, None]] = np.nan # indicators not ready at the start of the window
+        for k in np.flatnonzero(np.nanmax(np.where(np.isnan(scores), -np.inf, scores), axis = 1) > best):
+            j = np.nanargmax(scores[k])
+            best[k] = scores[k, j]
+            best_params[k] = (values1[i], values2[j])
+            oos[k] = net[b[k]:c[k], j].copy()
+            held[k] = position[b[k] - 1, j], position[c[k] - 1, j]
+
+    # switch at the fold boundary: previous fold's position -> new combination's position
+    for k in range(1, len(bounds)):
+        if oos[k] is not None:
+            oos[k][0] -= tc * np.abs(held[k, 0] - held[k - 1, 1])
+
+    folds = pd.DataFrame({"is_start": index[a], "oos_start": index[b], "oos_end": index[c - 1]})
+    folds[list(names)] = best_params
+    folds["is_perf"] = np.where(np.isfinite(best), np.exp(best), np.nan)
+    folds["oos_perf"] = [np.exp(x.sum()) if x is not None else np.nan for x in oos]
+
+    strategy_returns = np.concatenate([x if x is not None else np.zeros(cc - bb) for x, bb, cc in zip(oos, b, c)])
+    results = pd.DataFrame({"returns": returns[b[0]:c[-1]], "strategy": strategy_returns}, index = index[b[0]:c[-1]])
+    results["creturns"] = results["returns"].cumsum().apply(np.exp)
+    results["cstrategy"] = results["strategy"].cumsum().apply(np.exp)
+    return folds, results
@@ -0,0 +1,13 @@
+import os
+import sys
+import pytest
+
+FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FOLDER) # the modules import each other by name
+
+
+@pytest.fixture(autouse = True)
+def data_folder(monkeypatch):
+    ''' Runs every test in the materials folder (the backtesters read their csv files from there).
+    '''
+    monkeypatch.chdir(FOLDER)
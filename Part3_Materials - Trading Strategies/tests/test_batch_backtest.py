@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+import BatchBacktest
+from BatchBacktest import price_matrix
+from SMABacktester import SMABacktester
+from MeanRevBacktester import MeanRevBacktester
+from ConBacktester import ConBacktester
+
+FOREX = ["EURUSD=X", "AUDEUR=X", "USDGBP=X"]
+INTRADAY = ["EURUSD", "GBPUSD", "EURAUD"]
+TC = 0.00007
+
+
+def assert_same(summary, symbol, result):
+    assert (summary.loc[symbol, "performance"], summary.loc[symbol, "outperformance"]) == result
+
+
+@pytest.mark.parametrize("SMA_S, SMA_L", [(50, 200), (10, 50)])
+def test_sma_many(SMA_S, SMA_L):
+    summary = SMABacktester.test_many(FOREX, SMA_S, SMA_L, "2004-01-01", "2020-06-30")
+    for symbol in FOREX:
+        assert_same(summary, symbol, SMABacktester(symbol, SMA_S, SMA_L, "2004-01-01", "2020-06-30").test_strategy())
+
+
+@pytest.mark.parametrize("SMA, dev", [(30, 2), (75, 1)])
+def test_meanrev_many(SMA, dev):
+    summary = MeanRevBacktester.test_many(INTRADAY, SMA, dev, "2018-01-01", "2019-12-31", TC)
+    for symbol in INTRADAY:
+        assert_same(summary, symbol, MeanRevBacktester(symbol, SMA, dev, "2018-01-01", "2019-12-31", TC).test_strategy())
+
+
+@pytest.mark.parametrize("window", [1, 3, 10])
+def test_con_many(window):
+    summary = ConBacktester.test_many(INTRADAY, window, "2018-01-01", "2019-12-31", TC)
+    for symbol in INTRADAY:
+        assert_same(summary, symbol, ConBacktester(symbol, "2018-01-01", "2019-12-31", TC).test_strategy(window))
+
+
+def test_price_matrix_opens_the_store_once(monkeypatch):
+    opened = []
+    store = BatchBacktest.PriceStore
+
+    def counted(*args, **kwargs):
+        opened.append(args)
+        return store(*args, **kwargs)
+
+    monkeypatch.setattr(BatchBacktest, "PriceStore", counted)
+    prices = price_matrix("intraday_pairs.csv", INTRADAY, "2018-01-01", "2019-12-31")
+    assert len(opened) == 1
+    streamed = price_matrix("intraday_pairs.csv", INTRADAY, "2018-01-01", "2019-12-31", cache = False)
+    np.testing.assert_array_equal(prices.to_numpy(), streamed.to_numpy())
@@ -0,0 +1,43 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from DataCache import read_csv_cached, read_meta, cache_path
+
+
+@pytest.fixture
+def csv(tmp_path):
+    index = pd.date_range("2020-01-01", periods = 50, freq = "h", name = "time")
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({"EURUSD": 1.1 + rng.random(50) / 100, "bar": np.arange(50.0)}, index = index)
+    path = str(tmp_path / "prices.csv")
+    frame.to_csv(path)
+    return path
+
+
+def test_hit_with_the_same_index(csv):
+    first = read_csv_cached(csv, parse_dates = ["time"], index_col = "time")
+    assert read_meta(csv, index_col = "time") is not None
+    pd.testing.assert_frame_equal(read_csv_cached(csv, parse_dates = ["time"], index_col = "time"), first,
+                                  check_index_type = False, check_freq = False)
+
+
+@pytest.mark.parametrize("parse_dates, index_col", [([], "bar"), ([], "time"), (["time"], "bar")])
+def test_other_index_is_a_miss(csv, parse_dates, index_col):
+    read_csv_cached(csv, parse_dates = ["time"], index_col = "time") # cached with the time index
+    raw = read_csv_cached(csv, parse_dates = parse_dates, index_col = index_col)
+    pd.testing.assert_frame_equal(raw, pd.read_csv(csv, parse_dates = parse_dates, index_col = index_col))
+    assert read_meta(csv, index_col = "bar") is None
+
+
+def test_cache_of_another_index_is_replaced(csv):
+    read_csv_cached(csv, parse_dates = ["time"], index_col = "time")
+    meta = read_meta(csv)
+    meta["index_name"] = "other" # e.g. cache built by a call with another (datetime) index column
+    with open(os.path.join(cache_path(csv), "meta.json"), "w") as f:
+        json.dump(meta, f)
+    assert read_meta(csv, index_col = "time") is None
+    raw = read_csv_cached(csv, parse_dates = ["time"], index_col = "time")
+    assert raw.index.name == "time"
+    assert read_meta(csv, index_col = "time") is not None
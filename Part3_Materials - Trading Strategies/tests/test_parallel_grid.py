@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from GridOptimizer import (sma_grid, sma_grid_means, bollinger_grid, bollinger_grid_bands, contrarian_grid,
+                           rolling_means, rolling_stds)
+from ParallelOptimizer import parallel_grid
+
+
+@pytest.fixture(scope = "module")
+def data():
+    rng = np.random.default_rng(1)
+    price = 1.1 * np.exp(np.cumsum(rng.normal(0, 1e-3, 3000)))
+    returns = np.append(np.nan, np.diff(np.log(price)))
+    return price, returns
+
+
+@pytest.mark.parametrize("chunks", [1, 3, 7])
+def test_sma_grid_on_shared_means(data, chunks):
+    price, returns = data
+    SMA_S, SMA_L = np.arange(5, 30), np.arange(40, 120, 3)
+    sma_s, sma_l = rolling_means(price, SMA_S), rolling_means(price, SMA_L)
+    perf = parallel_grid(sma_grid_means, [returns, sma_s, sma_l], SMA_S, SMA_L, 0.0001, split = (1,),
+                         processes = 2, chunks = chunks)
+    np.testing.assert_array_equal(perf, sma_grid(price, returns, SMA_S, SMA_L, 0.0001))
+
+
+def test_bollinger_grid_on_shared_bands(data):
+    price, returns = data
+    SMA, dev = np.arange(10, 60, 2), np.arange(1, 4)
+    smas, stds = rolling_means(price, SMA), rolling_stds(price, SMA)
+    perf = parallel_grid(bollinger_grid_bands, [price, returns, smas, stds], SMA, dev, 0.0001, split = (2, 3),
+                         processes = 2)
+    np.testing.assert_array_equal(perf, bollinger_grid(price, returns, SMA, dev, 0.0001))
+
+
+def test_contrarian_grid_without_indicators(data):
+    price, returns = data
+    windows = np.arange(1, 40)
+    perf, trades = parallel_grid(contrarian_grid, [returns], windows, 0.0001, processes = 2)
+    expected = contrarian_grid(returns, windows, 0.0001)
+    np.testing.assert_array_equal(perf, expected[0])
+    np.testing.assert_array_equal(trades, expected[1])
+
+
+def failing_grid(returns, values):
+    raise ZeroDivisionError("grid failed")
+
+
+def test_errors_are_not_hidden(data):
+    price, returns = data
+    with pytest.raises(ValueError): # arrays of different length: filling the shared block fails
+        parallel_grid(sma_grid_means, [returns, rolling_means(price[:-1], [5])], [5], [40], split = (1,), processes = 2)
+    with pytest.raises(ZeroDivisionError): # worker error
+        parallel_grid(failing_grid, [returns], [1, 2], processes = 2)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from SMABacktester import SMABacktester
+from MeanRevBacktester import MeanRevBacktester
+from ConBacktester import ConBacktester
+
+
+# Bounds of the deviation of perf/outperf with precision = "float32" from float64:
+# - SMA and Bollinger Bands: none beyond the rounding of test_strategy (6 decimals).
+# - Contrarian: positions may only differ on bars where the rolling mean of returns is zero
+#   (the price is back at the same level, so its sign is rounding noise in both precisions).
+#   Each such bar changes the strategy return of the next bar by at most 2 |return| plus
+#   the costs of up to two extra reversals; in total the deviation stays below CON_MAX_DEV.
+ROUNDING = 1e-6
+CON_MAX_DEV = 5e-3
+TC = 0.00007
+
+
+def deviation(result64, result32):
+    return max(abs(result64[0] - result32[0]), abs(result64[1] - result32[1]))
+
+
+@pytest.mark.parametrize("symbol", ["EURUSD=X", "AUDEUR=X", "USDGBP=X"])
+@pytest.mark.parametrize("SMA_S, SMA_L", [(50, 200), (20, 100), (10, 50), (5, 30)])
+def test_sma_float32(symbol, SMA_S, SMA_L):
+    result64 = SMABacktester(symbol, SMA_S, SMA_L, "2004-01-01", "2020-06-30").test_strategy()
+    result32 = SMABacktester(symbol, SMA_S, SMA_L, "2004-01-01", "2020-06-30", precision = "float32").test_strategy()
+    assert deviation(result64, result32) <= ROUNDING
+
+
+@pytest.mark.parametrize("symbol", ["EURUSD", "GBPUSD", "EURAUD"])
+@pytest.mark.parametrize("SMA, dev", [(30, 2), (20, 1), (50, 3), (75, 2)])
+def test_meanrev_float32(symbol, SMA, dev):
+    result64 = MeanRevBacktester(symbol, SMA, dev, "2018-01-01", "2019-12-31", TC).test_strategy()
+    result32 = MeanRevBacktester(symbol, SMA, dev, "2018-01-01", "2019-12-31", TC, precision = "float32").test_strategy()
+    assert deviation(result64, result32) <= ROUNDING
+
+
+@pytest.mark.parametrize("symbol", ["EURUSD", "GBPUSD", "EURAUD"])
+@pytest.mark.parametrize("window", [1, 3, 10, 50, 100])
+def test_con_float32(symbol, window):
+    tester64 = ConBacktester(symbol, "2018-01-01", "2019-12-31", TC)
+    tester32 = ConBacktester(symbol, "2018-01-01", "2019-12-31", TC, precision = "float32")
+    result64, result32 = tester64.test_strategy(window), tester32.test_strategy(window)
+    assert tester32.results["cstrategy"].dtype == "float64" # accumulated in float64
+
+    position64, valid = tester64.positions(window)
+    position32, _ = tester32.positions(window)
+    flipped = valid & (position64 != position32)
+    means = tester64.data["returns"].rolling(window).mean().to_numpy()
+    assert np.all(np.abs(means[flipped]) < 1e-12) # only where the rolling mean is zero
+
+    returns = np.nan_to_num(tester64.data["returns"].to_numpy())
+    next_bar = np.flatnonzero(flipped) + 1
+    next_bar = next_bar[next_bar < len(returns)]
+    bound = result64[0] * (np.exp(np.sum(2 * np.abs(returns[next_bar])) + 4 * TC * flipped.sum()) - 1)
+    assert deviation(result64, result32) <= bound + ROUNDING
+    assert deviation(result64, result32) <= CON_MAX_DEV
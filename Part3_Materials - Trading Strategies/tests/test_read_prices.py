@@ -0,0 +1,47 @@
+import os
+import shutil
+import pandas as pd
+import pytest
+from DataCache import read_csv_window, CACHE_DIR
+from PriceStore import read_prices
+
+
+def old_get_data(filepath, symbol, start, end, index_col):
+    ''' get_data() before the price store: full import, then symbol column, dropna and date slice.
+    '''
+    raw = pd.read_csv(filepath, parse_dates = [index_col], index_col = index_col)
+    raw = raw[symbol].to_frame().dropna()
+    raw = raw.loc[start:end].copy()
+    raw.rename(columns = {symbol: "price"}, inplace = True)
+    return raw
+
+
+WINDOWS = [("forex_pairs.csv", "Date", "EURUSD=X", "2004-01-01", "2020-06-30"),
+           ("forex_pairs.csv", "Date", "USDGBP=X", "2010-03", "2010-03"),
+           ("intraday_pairs.csv", "time", "EURUSD", "2018-03", "2019-06-15"),
+           ("intraday_pairs.csv", "time", "GBPUSD", None, None),
+           ("intraday_pairs.csv", "time", "EURAUD", "2030-01-01", None)] # after the last bar
+
+
+@pytest.mark.parametrize("filepath, index_col, symbol, start, end", WINDOWS)
+@pytest.mark.parametrize("chunksize", [1000, 100000])
+def test_read_csv_window_equals_get_data(filepath, index_col, symbol, start, end, chunksize):
+    expected = old_get_data(filepath, symbol, start, end, index_col)
+    result = read_csv_window(filepath, symbol, start, end, index_col, chunksize = chunksize)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+@pytest.mark.parametrize("filepath, index_col, symbol, start, end", WINDOWS[:3])
+def test_read_prices_without_cache(tmp_path, filepath, index_col, symbol, start, end):
+    copy = shutil.copy(filepath, tmp_path)
+    result = read_prices(copy, symbol, start, end, index_col, cache = False)
+    pd.testing.assert_frame_equal(result, old_get_data(filepath, symbol, start, end, index_col))
+    assert not os.path.exists(os.path.join(tmp_path, CACHE_DIR)) # nothing written
+
+
+@pytest.mark.parametrize("filepath, index_col, symbol, start, end", WINDOWS[:3])
+def test_read_prices_store_and_stream_agree(filepath, index_col, symbol, start, end):
+    stored = read_prices(filepath, symbol, start, end, index_col)
+    streamed = read_prices(filepath, symbol, start, end, index_col, cache = False)
+    pd.testing.assert_frame_equal(stored, streamed, check_index_type = False) # index unit may differ (ns cache)
+    assert stored.index.equals(streamed.index)
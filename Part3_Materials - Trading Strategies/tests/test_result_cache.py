@@ -0,0 +1,100 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from multiprocessing import Pool
+from ResultCache import ResultCache as Cache, enable_result_cache, disable_result_cache
+from SMABacktester import SMABacktester
+
+ENTRY = Cache.entry_size((1.0, 0.0, None)) # size of an entry without results frame
+
+
+@pytest.fixture
+def result_cache(request):
+    cache = enable_result_cache(**getattr(request, "param", {}))
+    yield cache
+    disable_result_cache()
+
+
+def test_lru_eviction_under_max_bytes():
+    cache = Cache(max_bytes = 3 * ENTRY)
+    for key in "abc":
+        cache.put(key, 1.0, 0.0)
+    cache.get("a") # a is now the most recently used entry
+    cache.put("d", 1.0, 0.0)
+    assert list(cache.entries) == ["c", "a", "d"] # b (least recently used) evicted
+    assert cache.nbytes == 3 * ENTRY <= cache.max_bytes
+    assert cache.get("b") is None
+
+
+def test_results_frames_count_towards_max_bytes():
+    frame = pd.DataFrame({"cstrategy": np.random.default_rng(0).random(1000)})
+    cache = Cache(max_bytes = 10**6, keep_results = True)
+    cache.put("a", 1.0, 0.0, frame)
+    size = cache.nbytes
+    assert size > ENTRY
+    cache.max_bytes = 2 * size
+    cache.put("b", 1.0, 0.0, frame)
+    cache.put("c", 1.0, 0.0, frame)
+    assert list(cache.entries) == ["b", "c"] and cache.nbytes <= cache.max_bytes
+    pd.testing.assert_frame_equal(Cache.load_results(cache.get("c")), frame)
+
+
+def test_disk_tier_hit_after_clear(tmp_path):
+    cache = Cache(disk_dir = str(tmp_path))
+    cache.put(("SMABacktester", 50.0, 200.0), 1.2835, 0.367674)
+    cache.clear()
+    assert not cache.entries
+    assert cache.get(("SMABacktester", 50.0, 200.0)) == (1.2835, 0.367674, None)
+    assert cache.hits == 1 and cache.misses == 0
+    assert ("SMABacktester", 50.0, 200.0) in cache.entries # loaded into the memory tier
+    assert os.listdir(tmp_path) == [os.path.basename(cache.disk_path(("SMABacktester", 50.0, 200.0)))]
+    cache.clear(disk = True)
+    assert cache.get(("SMABacktester", 50.0, 200.0)) is None
+
+
+def write_entries(disk_dir):
+    cache = Cache(disk_dir = disk_dir)
+    for i in range(200):
+        cache.put("same key", float(i), 0.0)
+
+
+def test_concurrent_writers_of_the_same_key(tmp_path):
+    with Pool(2) as pool:
+        pool.map(write_entries, [str(tmp_path)] * 4)
+    entry = Cache(disk_dir = str(tmp_path)).get("same key")
+    assert entry == (199.0, 0.0, None)
+    assert len(os.listdir(tmp_path)) == 1 # no temp files left
+
+
+def test_miss_when_prices_change(result_cache):
+    tester = SMABacktester("EURUSD=X", 50, 200, "2004-01-01", "2020-06-30")
+    first = tester.test_strategy()
+    assert tester.test_strategy() == first and result_cache.hits == 1
+
+    tester.data = tester.data.assign(price = tester.data["price"] * 1.01) # e.g. revised data
+    tester.test_strategy()
+    assert result_cache.hits == 1 and result_cache.misses == 2
+
+
+def test_hit_without_results_frame_keeps_results(result_cache):
+    tester = SMABacktester("EURUSD=X", 50, 200, "2004-01-01", "2020-06-30")
+    tester.set_parameters(20, 100)
+    expected = tester.test_strategy()
+    frame = tester.results
+    tester.set_parameters(50, 200)
+    tester.test_strategy()
+    tester.set_parameters(20, 100)
+    assert tester.test_strategy() == expected and result_cache.hits == 1
+    pd.testing.assert_frame_equal(tester.results, frame) # not None (plot_results works after optimize_parameters)
+
+
+@pytest.mark.parametrize("result_cache", [{"keep_results": True}], indirect = True)
+def test_hit_with_results_frame(result_cache):
+    tester = SMABacktester("EURUSD=X", 50, 200, "2004-01-01", "2020-06-30")
+    tester.test_strategy()
+    frame = tester.results
+    tester.results = None
+    tester.test_strategy()
+    assert result_cache.hits == 1
+    pd.testing.assert_frame_equal(tester.results, frame)
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+from WalkForward import walk_forward, sma_net_returns, bollinger_net_returns
+
+TC = 0.001
+
+
+@pytest.fixture(scope = "module")
+def data():
+    rng = np.random.default_rng(3)
+    index = pd.date_range("2020-01-01", periods = 3000, freq = "h")
+    price = pd.Series(1.1 * np.exp(np.cumsum(rng.normal(0, 2e-3, len(index)))), index = index)
+    return price, np.log(price / price.shift(1))
+
+
+def sma_position(price, S, L):
+    sma_s, sma_l = price.rolling(S).mean(), price.rolling(L).mean()
+    return np.where(sma_s.notna() & sma_l.notna(), np.where(sma_s > sma_l, 1.0, -1.0), 0.0)
+
+
+def bollinger_position(price, SMA, dev):
+    sma, std = price.rolling(SMA).mean(), price.rolling(SMA).std()
+    distance = price - sma
+    position = np.where(price < sma - std * dev, 1, np.nan)
+    position = np.where(price > sma + std * dev, -1, position)
+    position = np.where(distance * distance.shift(1) < 0, 0, position)
+    return pd.Series(position).ffill().fillna(0).to_numpy()
+
+
+def stitched_returns(folds, price, returns, positions, names):
+    ''' Bar by bar: hold the previous fold's position until the last bar before the fold, then switch.
+    '''
+    returns = returns.fillna(0).to_numpy()
+    index = list(price.index)
+    strategy, switches, previous = [], 0, None
+    for _, fold in folds.iterrows():
+        b, c = index.index(fold["oos_start"]), index.index(fold["oos_end"]) + 1
+        position = positions(price, int(fold[names[0]]), int(fold[names[1]]))
+        if previous is not None: # switch at the close of bar b - 1
+            switch = TC * abs(position[b - 1] - previous[b - 1])
+        else:
+            switch = 0.0
+        switches += switch > 0
+        for t in range(b, c):
+            strategy.append(position[t - 1] * returns[t] - TC * abs(position[t] - position[t - 1]) - (switch if t == b else 0))
+        previous = position
+    return np.array(strategy), switches
+
+
+@pytest.mark.parametrize("strategy, positions, values1, values2, names", [
+    (sma_net_returns, sma_position, np.arange(5, 50, 5), np.arange(60, 200, 20), ("SMA_S", "SMA_L")),
+    (bollinger_net_returns, bollinger_position, np.arange(10, 60, 10), np.arange(1, 4), ("SMA", "dev"))])
+def test_switch_costs_at_fold_boundaries(data, strategy, positions, values1, values2, names):
+    price, returns = data
+    folds, results = walk_forward(strategy, price, returns, values1, values2, 300, 100, TC,
+                                  warmup = max(values1.max(), values2.max()), names = names)
+    expected, switches = stitched_returns(folds, price, returns, positions, names)
+    assert switches > 0 # some folds switch to a combination with a different position
+    np.testing.assert_allclose(results["strategy"].to_numpy(), expected, atol = 1e-12)
+    np.testing.assert_allclose(np.log(folds["oos_perf"]).sum(), expected.sum(), atol = 1e-9)
@@ -0,0 +1,121 @@
+import os
+import pandas as pd
+
+
+def complete_bars(prices, bar_length):
+    ''' Resamples fine-grained prices (e.g. S5 candles) into bars, dropping the last (incomplete) bar.
+
+    Bars are labeled with their (right) end, like in the live traders.
+    '''
+    return prices.resample(bar_length, label = "right").last().dropna().iloc[:-1]
+
+
+class BarStore():
+    ''' Append-only local store of completed bars (one segment file per instrument and day).
+
+    Live sessions append every completed bar, so that a (re-)start only has to fetch
+    the missing tail since the last stored bar instead of days of history.
+    Segments are csv files: <root>/<instrument>/<bar length in seconds>s/<YYYY-MM-DD>.csv
+    '''
+
+    def __init__(self, root, instrument, bar_length):
+        '''
+        Parameters
+        ----------
+        root: str
+            folder of the store
+        instrument: str
+            instrument (also the name of the price column)
+        bar_length: str or Timedelta
+            bar length of the stored bars
+        '''
+        self.instrument = instrument
+        self.bar_length = pd.to_timedelta(bar_length)
+        self.folder = os.path.join(root, instrument, "{}s".format(int(self.bar_length.total_seconds())))
+        self.last_stored = None
+
+    def __repr__(self):
+        return "BarStore(folder = {})".format(self.folder)
+
+    def segments(self):
+        ''' Returns the (sorted) days with a segment file.
+        '''
+        if not os.path.isdir(self.folder):
+            return []
+        return sorted(name[:-4] for name in os.listdir(self.folder) if name.endswith(".csv"))
+
+    def segment_path(self, day):
+        return os.path.join(self.folder, "{}.csv".format(day))
+
+    def read_segment(self, day):
+        df = pd.read_csv(self.segment_path(day), parse_dates = ["time"], index_col = "time")
+        return df[[self.instrument]].dropna() # dropna: incomplete last line (e.g. crash while writing)
+
+    def last_bar(self):
+        ''' Returns the time of the last stored bar (None if the store is empty).
+        '''
+        if self.last_stored is None:
+            for day in reversed(self.segments()):
+                df = self.read_segment(day)
+                if len(df):
+                    self.last_stored = df.index[-1]
+                    break
+        return self.last_stored
+
+    def load(self, start = None):
+        ''' Returns all stored bars since start (UTC).
+        '''
+        if start is not None:
+            start = pd.Timestamp(start)
+            if start.tzinfo is None:
+                start = start.tz_localize("UTC")
+        days = [day for day in self.segments() if start is None or day >= str(start.date())]
+        if not days:
+            return pd.DataFrame(columns = [self.instrument], index = pd.DatetimeIndex([], tz = "UTC", name = "time"))
+        df = pd.concat([self.read_segment(day) for day in days])
+        return df.loc[start:]
+
+    def append(self, bars):
+        ''' Appends completed bars (DataFrame with the price column) that are newer than the last stored bar.
+        '''
+        last = self.last_bar()
+        if last is not None:
+            bars = bars.loc[bars.index > last]
+        bars = bars[[self.instrument]].dropna()
+        if bars.empty:
+            return
+        os.makedirs(self.folder, exist_ok = True)
+        bars = bars.rename_axis("time")
+        for day, df in bars.groupby(bars.index.date):
+            path = self.segment_path(day)
+            with open(path, "a") as f:
+                df.to_csv(f, header = f.tell() == 0)
+        self.last_stored = bars.index[-1]
+
+    def update(self, fetch, start, end):
+        ''' Returns the completed bars between start and end, fetching only what is not stored yet.
+
+        Stored bars since start are loaded from the segments. Only the tail since the last
+        stored bar is fetched (nothing if no complete bar is missing); its completed bars
+        are appended to the store.
+
+        Parameters
+        ----------
+        fetch: function
+            fetch(start, end) returns fine-grained prices (price column: instrument, tz-aware
+            DatetimeIndex), e.g. S5 candles from the history endpoint
+        start, end: datetime
+            window (naive UTC)
+        '''
+        stored = self.load(start = start)
+        if len(stored):
+            fetch_from = max(start, stored.index[-1].tz_convert(None).to_pydatetime())
+            if end - fetch_from < self.bar_length:
+                return stored # no complete bar missing
+        else:
+            fetch_from = start
+        bars = complete_bars(fetch(fetch_from, end), self.bar_length)
+        self.append(bars)
+        if len(stored):
+            bars = pd.concat([stored, bars.loc[bars.index > stored.index[-1]]])
+        return bars
@@ -0,0 +1,61 @@
+import numpy as np
+
+
+def spread_array(spread, index):
+    ''' Returns the (absolute) bid-ask spread for every bar of index.
+
+    spread is a constant (float, in price units) or a Series (e.g. the spread column of
+    detailed.csv) that is aligned to index (forward filled; bars before the first entry
+    have no spread).
+    '''
+    if np.isscalar(spread):
+        return np.full(len(index), float(spread))
+    return spread.reindex(index, method = "ffill").fillna(0).to_numpy(dtype = "float64")
+
+
+def fill_prices(price, spread):
+    ''' Returns the ask (price + spread/2) and the bid price (price - spread/2), like IterativeBase.
+    '''
+    price = np.asarray(price, dtype = "float64")
+    spread = np.asarray(spread, dtype = "float64")
+    return price + spread / 2, price - spread / 2
+
+
+def spread_performance(position, price, spread, valid):
+    ''' Performance of positions with the execution model of IterativeBase (vectorized).
+
+    Orders are filled at the ask (buy) and bid price (sell) of the trade bar and the full
+    balance is invested with every new position (amount = "all"). A long leg from bar a to
+    bar b therefore returns bid(b) / ask(a), a short leg 2 - ask(b) / bid(a) (the short sale
+    proceeds are held as cash), a neutral leg nothing. The position is closed at the last
+    bar (like close_pos), so only the legs need to be evaluated, not every bar. Units are
+    not rounded to integers, so the result matches the iterative backtest within rounding.
+
+    Parameters
+    ----------
+    position: array-like
+        positions (1, 0, -1) per bar, taken at the end of the bar
+    price, spread: array-like
+        (mid) prices and absolute bid-ask spreads per bar
+    valid: array-like
+        rows that are complete (kept by dropna in test_strategy)
+
+    Returns
+    -------
+    perf: float
+        absolute performance (final balance / initial balance)
+    trades: int
+        number of trades (a reversal counts twice, the final close included)
+    '''
+    valid = np.asarray(valid)
+    position = np.asarray(position, dtype = "float64")[valid]
+    ask, bid = fill_prices(np.asarray(price)[valid], np.asarray(spread)[valid])
+    if len(position) < 2:
+        raise IndexError("No complete bars to backtest.")
+
+    target = np.append(position[:-1], 0) # closed at the last bar
+    change = np.flatnonzero(np.diff(target, prepend = 0)) # trade bars
+    start, end = change[:-1], change[1:] # legs between two trade bars
+    leg = target[start]
+    factor = np.where(leg == 1, bid[end] / ask[start], np.where(leg == -1, 2 - ask[end] / bid[start], 1.0))
+    return np.prod(factor), int(np.abs(np.diff(target, prepend = 0)).sum())
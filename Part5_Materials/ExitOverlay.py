@@ -0,0 +1,96 @@
+import pandas as pd
+import numpy as np
+
+
+REASONS = ["sl", "tsl", "tp"] # stop loss, trailing stop loss, take profit
+
+
+class ExitOverlay():
+    ''' Stop loss, trailing stop loss and take profit exits on top of a vectorized position series.
+
+    A trade is a run of equal non-zero positions. The levels are set like in the live traders
+    (sl_perc, tsl_perc, tp_perc): the stop loss and the trailing distance are fractions of the
+    entry price, the trailing stop follows the best price since entry (running max/min within
+    the trade) and the take profit is a fraction above/below the entry price. Prices are only
+    checked at the bar closes; the trade is closed at the first bar that hits one of the levels
+    and stays neutral until the position series changes (new signal).
+
+    Trades, entry prices and the running max/min are computed once in the constructor, so
+    every SL/TSL/TP setting only costs a few vectorized passes over the bars.
+    '''
+
+    def __init__(self, position, price):
+        '''
+        Parameters
+        ==========
+        position: array-like
+            positions (1, 0, -1) per bar, taken at the end of the bar (0 for incomplete bars)
+        price: array-like
+            (close) prices per bar
+        '''
+        self.position = np.nan_to_num(np.asarray(position, dtype = "float64"))
+        self.price = np.asarray(price, dtype = "float64")
+        self.bars = np.arange(len(self.position))
+
+        change = np.diff(self.position, prepend = np.nan) != 0 # first bar of every run (incl. the first bar)
+        self.starts = np.flatnonzero(change)
+        self.run = np.cumsum(change) - 1 # run of every bar
+        self.side = np.sign(self.position)
+        self.entry = self.price[self.starts][self.run] # entry price of the trade of every bar
+        by_run = pd.Series(self.price).groupby(self.run)
+        self.peak = by_run.cummax().to_numpy() # best price since entry (long)
+        self.trough = by_run.cummin().to_numpy() # best price since entry (short)
+
+    def __repr__(self):
+        trades = np.count_nonzero(self.side[self.starts])
+        return "ExitOverlay(bars = {}, trades = {})".format(len(self.position), trades)
+
+    def hits(self, sl_perc = None, tsl_perc = None, tp_perc = None):
+        ''' Returns the bars that hit the stop loss, trailing stop loss and take profit level (dict of boolean arrays).
+        '''
+        long, short, price, entry = self.side > 0, self.side < 0, self.price, self.entry
+        hits = {}
+        if sl_perc:
+            hits["sl"] = long & (price <= entry * (1 - sl_perc)) | short & (price >= entry * (1 + sl_perc))
+        if tsl_perc:
+            distance = entry * tsl_perc
+            hits["tsl"] = long & (price <= self.peak - distance) | short & (price >= self.trough + distance)
+        if tp_perc:
+            hits["tp"] = long & (price >= entry * (1 + tp_perc)) | short & (price <= entry * (1 - tp_perc))
+        return hits
+
+    def first_hits(self, hits):
+        ''' Returns the first bar of every run that hits a level (number of bars if none).
+        '''
+        n = len(self.position)
+        if not hits:
+            return np.full(len(self.starts), n)
+        hit = np.logical_or.reduce(list(hits.values()))
+        return np.minimum.reduceat(np.where(hit, self.bars, n), self.starts)
+
+    def apply(self, sl_perc = None, tsl_perc = None, tp_perc = None):
+        ''' Returns the positions with the exits applied (neutral from the exit bar until the next signal).
+
+        Parameters
+        ==========
+        sl_perc, tsl_perc, tp_perc: float (optional)
+            stop loss, trailing stop loss (distance) and take profit as fraction of the entry price
+        '''
+        first = self.first_hits(self.hits(sl_perc, tsl_perc, tp_perc))
+        return np.where(self.bars >= first[self.run], 0.0, self.position)
+
+    def trades(self, sl_perc = None, tsl_perc = None, tp_perc = None):
+        ''' Returns all trades with entry and exit bar, side and exit reason ("sl", "tsl", "tp" or "signal").
+        '''
+        hits = self.hits(sl_perc, tsl_perc, tp_perc)
+        first = self.first_hits(hits)
+        n = len(self.position)
+        exited = first < n
+        reason = np.full(len(self.starts), "signal", dtype = object)
+        for name in reversed(REASONS): # sl wins if several levels are hit at the same bar
+            if name in hits:
+                reason[exited & hits[name][np.minimum(first, n - 1)]] = name
+        ends = np.append(self.starts[1:], n - 1) # next signal (or closed at the last bar)
+        trades = pd.DataFrame({"entry": self.starts, "exit": np.minimum(first, ends), "side": self.side[self.starts],
+                               "reason": reason})
+        return trades[trades["side"] != 0].reset_index(drop = True)
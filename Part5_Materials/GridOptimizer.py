@@ -0,0 +1,228 @@
+import pandas as pd
+import numpy as np
+
+
+def rolling_means(price, windows):
+    ''' Simple moving averages of price for many windows (each window computed once).
+
+    Returns an array of shape (bars, windows) with NaN before a window is complete.
+    The same rolling kernel as price.rolling(window).mean() is used on purpose: means
+    derived from a cumulative sum differ in the last bits, which flips positions on bars
+    where both SMAs are (exactly) equal.
+    '''
+    price = pd.Series(np.asarray(price, dtype = "float64"))
+    means = np.full((len(price), len(windows)), np.nan)
+    for i, window in enumerate(windows):
+        means[:, i] = price.rolling(window).mean().to_numpy()
+    return means
+
+
+def sma_grid(price, returns, SMA_S_values, SMA_L_values, tc = 0.0):
+    ''' Backtests the SMA crossover strategy for all (SMA_S, SMA_L) combinations.
+
+    Same logic as SMABacktester.test_strategy (long if SMA_S > SMA_L, short otherwise,
+    bars without both SMAs and returns are dropped, tc per unit of position change), but
+    every SMA is computed only once and all SMA_L values are scored per SMA_S in one
+    broadcast pass (see sma_grid_means).
+
+    Parameters
+    ----------
+    price, returns: array-like
+        prices and log returns (first return NaN)
+    SMA_S_values, SMA_L_values: array-like
+        windows to be tested
+    tc: float
+        proportional transaction costs per trade
+
+    Returns
+    -------
+    perf: array of shape (len(SMA_S_values), len(SMA_L_values))
+        absolute performance (NaN if the data is too short for a combination)
+    '''
+    sma_s = rolling_means(price, SMA_S_values)
+    sma_l = rolling_means(price, SMA_L_values)
+    return sma_grid_means(returns, sma_s, sma_l, SMA_S_values, SMA_L_values, tc)
+
+
+def sma_grid_means(returns, sma_s, sma_l, SMA_S_values, SMA_L_values, tc = 0.0):
+    ''' Scores the SMA crossover grid on precomputed SMAs (broadcast pass of sma_grid only).
+
+    sma_s and sma_l are the rolling_means of the SMA_S and SMA_L windows (one column per
+    window), so they can be computed once and shared (e.g. by parallel_grid) while the
+    scoring is split across SMA_S values.
+
+    Parameters
+    ----------
+    returns: array-like
+        log returns (first return NaN)
+    sma_s, sma_l: array of shape (bars, windows)
+        SMAs of SMA_S_values and SMA_L_values (see rolling_means)
+    SMA_S_values, SMA_L_values: array-like
+        windows of the columns of sma_s and sma_l
+    tc: float
+        proportional transaction costs per trade
+    '''
+    returns = np.nan_to_num(np.asarray(returns, dtype = "float64")) # first return NaN -> 0
+    SMA_S_values = np.asarray(SMA_S_values, dtype = int)
+    SMA_L_values = np.asarray(SMA_L_values, dtype = int)
+    bars = len(returns)
+    cumreturns = np.cumsum(returns)
+    cols = np.arange(len(SMA_L_values))
+
+    perf = np.full((len(SMA_S_values), len(SMA_L_values)), np.nan)
+    for i, S in enumerate(SMA_S_values):
+        first = np.maximum(np.maximum(S, SMA_L_values) - 1, 1) # first bar with both SMAs and returns
+        valid = first + 1 < bars
+        first = np.minimum(first, bars - 2)
+        long = sma_s[:, i:i + 1] > sma_l # position 1 (long) or -1 (short); always short before first
+
+        # sum of position(t-1) * returns(t) for t > first (position = 2 * long - 1)
+        strategy = 2 * (returns[1:] @ long[:-1]) - cumreturns[-1] + cumreturns[first]
+
+        # position changes from first + 2 on (the first strategy bar doesn't count as a trade)
+        changes = np.count_nonzero(long[1:] != long[:-1], axis = 0)
+        changes -= long[first, cols] # short -> long switch in bar first
+        changes -= long[first + 1, cols] != long[first, cols]
+        trades = 2 * changes
+
+        perf[i, valid] = np.exp(strategy[valid] - trades[valid] * tc)
+    return perf
+
+
+def rolling_stds(price, windows):
+    ''' Rolling standard deviations of price for many windows (same kernel as price.rolling(window).std()).
+    '''
+    price = pd.Series(np.asarray(price, dtype = "float64"))
+    stds = np.full((len(price), len(windows)), np.nan)
+    for i, window in enumerate(windows):
+        stds[:, i] = price.rolling(window).std().to_numpy()
+    return stds
+
+
+def ffill(signals):
+    ''' Forward fills NaN along the time axis (axis 0) of a 2-D array.
+    '''
+    rows = np.arange(len(signals))[:, None]
+    last = np.maximum.accumulate(np.where(np.isnan(signals), 0, rows), axis = 0)
+    return np.take_along_axis(signals, last, axis = 0)
+
+
+def bollinger_grid(price, returns, SMA_values, dev_values, tc = 0.0):
+    ''' Backtests the Bollinger Bands strategy for all (SMA, dev) combinations.
+
+    Same logic as MeanRevBacktester.test_strategy. Rolling mean and std are computed
+    once per SMA window; all dev values are then evaluated against them in one
+    vectorized pass of the position state machine over (time x dev) (see bollinger_grid_bands).
+
+    Parameters
+    ----------
+    price, returns: array-like
+        prices and log returns (first return NaN)
+    SMA_values, dev_values: array-like
+        SMA windows and band widths (in standard deviations) to be tested
+    tc: float
+        proportional transaction costs per trade
+
+    Returns
+    -------
+    perf: array of shape (len(SMA_values), len(dev_values))
+        absolute performance (NaN if the data is too short for a combination)
+    '''
+    smas = rolling_means(price, SMA_values)
+    stds = rolling_stds(price, SMA_values)
+    return bollinger_grid_bands(price, returns, smas, stds, SMA_values, dev_values, tc)
+
+
+def bollinger_grid_bands(price, returns, smas, stds, SMA_values, dev_values, tc = 0.0):
+    ''' Scores the Bollinger Bands grid on precomputed rolling means and stds (state machine pass only).
+
+    smas and stds are the rolling_means and rolling_stds of the SMA windows (one column
+    per window), so they can be computed once and shared (e.g. by parallel_grid).
+
+    Parameters
+    ----------
+    price, returns: array-like
+        prices and log returns (first return NaN)
+    smas, stds: array of shape (bars, windows)
+        rolling means and standard deviations of SMA_values
+    SMA_values, dev_values: array-like
+        SMA windows of the columns of smas and stds and band widths to be tested
+    tc: float
+        proportional transaction costs per trade
+    '''
+    price = np.asarray(price, dtype = "float64")
+    returns = np.asarray(returns, dtype = "float64")
+    SMA_values = np.asarray(SMA_values, dtype = int)
+    dev_values = np.asarray(dev_values)
+    bars = len(price)
+
+    perf = np.full((len(SMA_values), len(dev_values)), np.nan)
+    for i, SMA in enumerate(SMA_values):
+        first = max(SMA - 1, 1) # first bar with SMA, bands and returns
+        if SMA < 2 or first + 1 >= bars: # std needs two bars
+            continue
+        sma = smas[first:, i:i + 1]
+        std = stds[first:, i:i + 1]
+        p = price[first:, None]
+        distance = p[:, 0] - sma[:, 0]
+
+        # position state machine for all dev values at once
+        signals = np.full((bars - first, len(dev_values)), np.nan)
+        signals[p < sma - std * dev_values] = 1 # below Lower -> long
+        signals[p > sma + std * dev_values] = -1 # above Upper -> short
+        signals[1:][distance[1:] * distance[:-1] < 0] = 0 # crossing the SMA -> neutral
+        position = np.nan_to_num(ffill(signals))
+
+        strategy = returns[first + 1:] @ position[:-1]
+        trades = np.abs(np.diff(position[1:], axis = 0)).sum(axis = 0)
+        perf[i] = np.exp(strategy - trades * tc)
+    return perf
+
+
+def contrarian_grid(returns, windows, tc = 0.0):
+    ''' Backtests the simple contrarian strategy for many windows in one pass.
+
+    Same logic as ConBacktester.test_strategy (position = -sign of the rolling mean of
+    returns). The sign of the rolling mean equals the sign of the rolling sum, which is
+    taken for all windows from one cumulative sum of returns, so positions, strategy
+    returns and trades of all windows are evaluated as one (windows x bars) array.
+
+    Parameters
+    ----------
+    returns: array-like
+        log returns (leading NaN is dropped)
+    windows: array-like
+        windows (number of bars) to be tested
+    tc: float
+        proportional transaction costs per trade
+
+    Returns
+    -------
+    perf: array of shape (len(windows),)
+        absolute performance (NaN if the data is too short for a window)
+    trades: array of shape (len(windows),)
+        number of trades (units of position change)
+    '''
+    returns = np.asarray(returns, dtype = "float64")
+    returns = returns[~np.isnan(returns)]
+    windows = np.asarray(windows, dtype = int)[:, None]
+    bars = np.arange(len(returns))[None, :]
+    cumreturns = np.concatenate([[0.0], np.cumsum(returns)])
+
+    # rolling sum of the last window returns in bar t: cumreturns[t + 1] - cumreturns[t + 1 - window]
+    start = bars + 1 - windows
+    sums = cumreturns[bars + 1] - cumreturns[np.maximum(start, 0)]
+    position = -np.sign(sums)
+    position[start < 0] = 0 # not enough bars yet
+
+    # (near) zero sums: the sign is rounding noise (e.g. same price at both ends of the window),
+    # take it from the same rolling kernel as test_strategy so that both agree
+    ties = (np.abs(sums) < 1e-10) & (start >= 0)
+    for i in np.flatnonzero(ties.any(axis = 1)):
+        means = pd.Series(returns).rolling(windows[i, 0]).mean().to_numpy()
+        position[i, ties[i]] = -np.sign(means[ties[i]])
+
+    strategy = np.sum(position[:, :-1] * returns[1:], axis = 1, where = bars[:, 1:] >= windows)
+    trades = np.sum(np.abs(np.diff(position, axis = 1)), axis = 1, where = bars[:, 1:] > windows)
+    perf = np.where(windows[:, 0] < len(returns), np.exp(strategy - trades * tc), np.nan)
+    return perf, trades
@@ -2,7 +2,17 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from PriceStore import read_prices
 from scipy.optimize import brute
+from itertools import product
+from GridOptimizer import bollinger_grid, bollinger_grid_bands, rolling_means, rolling_stds, ffill
+from ResultCache import memoized
+from ParallelOptimizer import parallel_grid
+from ParameterSearch import SEARCHES, prefix_indicators
+from WalkForward import walk_forward, bollinger_net_returns
+from BatchBacktest import price_matrix, summarize, performance, strategy_bars, bar_costs, cost_curve
+from ExecutionCosts import spread_array, spread_performance
+from ExitOverlay import ExitOverlay
 plt.style.use("seaborn-v0_8")
 
 
@@ -23,6 +33,8 @@ class MeanRevBacktester():
         end date for data retrieval
     tc: float
         proportional transaction costs per trade
+    raw_data: DataFrame (optional)
+        price data (column "price") to be used instead of importing twenty_minutes.csv
         
     Methods
     =======
@@ -35,6 +47,9 @@ class MeanRevBacktester():
     test_strategy:
         runs the backtest for the Mean Reversion-based strategy
         
+    test_many:
+        runs the backtest for several symbols at once (per-symbol summary)
+        
     plot_results:
         plots the performance of the strategy compared to buy and hold
         
@@ -42,34 +57,57 @@ class MeanRevBacktester():
         updates parameters and returns the negative absolute performance (for minimization algorithm)
         
     optimize_parameters:
-        implements a brute force optimization for the two parameters
+        implements a brute force (grid) optimization or a faster search for the two parameters
+        
+    walk_forward:
+        rolling in-sample optimization with out-of-sample tests (stitched out-of-sample performance)
     '''
     
-    def __init__(self, symbol, SMA, dev, start, end, tc):
+    def __init__(self, symbol, SMA, dev, start, end, tc, raw_data = None):
         self.symbol = symbol
         self.SMA = SMA
         self.dev = dev
         self.start = start
         self.end = end
         self.tc = tc
+        self.raw_data = raw_data
         self.results = None
-        self.get_data()
+        self._data = None # imported lazily on first use, see preload()
         
     def __repr__(self):
         rep = "MeanRevBacktester(symbol = {}, SMA = {}, dev = {}, start = {}, end = {})"
         return rep.format(self.symbol, self.SMA, self.dev, self.start, self.end)
         
+    @property
+    def data(self):
+        ''' Dataset (imported on first access).
+        '''
+        if self._data is None:
+            self.preload()
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+
+    def preload(self):
+        ''' Imports the data now instead of on first use (e.g. to pay the loading cost up front).
+        '''
+        if self._data is None:
+            self.get_data()
+
     def get_data(self):
         ''' Retrieves and prepares the data.
         '''
-        raw = pd.read_csv("twenty_minutes.csv", parse_dates = ["time"], index_col = "time")
-        raw = raw[self.symbol].to_frame().dropna()
-        raw = raw.loc[self.start:self.end]
-        raw.rename(columns={self.symbol: "price"}, inplace=True)
+        if self.raw_data is not None: # e.g. shared (read-only) price view
+            raw = self.raw_data.copy(deep = False)
+        else:
+            raw = read_prices("twenty_minutes.csv", self.symbol, self.start, self.end)
         raw["returns"] = np.log(raw / raw.shift(1))
+        std = raw["price"].rolling(self.SMA).std()
         raw["SMA"] = raw["price"].rolling(self.SMA).mean()
-        raw["Lower"] = raw["SMA"] - raw["price"].rolling(self.SMA).std() * self.dev
-        raw["Upper"] = raw["SMA"] + raw["price"].rolling(self.SMA).std() * self.dev
+        raw["Lower"] = raw["SMA"] - std * self.dev
+        raw["Upper"] = raw["SMA"] + std * self.dev
         self.data = raw
         return raw
         
@@ -79,17 +117,40 @@ class MeanRevBacktester():
         if SMA is not None:
             self.SMA = SMA
             self.data["SMA"] = self.data["price"].rolling(self.SMA).mean()
-            self.data["Lower"] = self.data["SMA"] - self.data["price"].rolling(self.SMA).std() * self.dev
-            self.data["Upper"] = self.data["SMA"] + self.data["price"].rolling(self.SMA).std() * self.dev
             
         if dev is not None:
             self.dev = dev
-            self.data["Lower"] = self.data["SMA"] - self.data["price"].rolling(self.SMA).std() * self.dev
-            self.data["Upper"] = self.data["SMA"] + self.data["price"].rolling(self.SMA).std() * self.dev
             
-    def test_strategy(self):
+        if SMA is not None or dev is not None: # rolling std only computed once
+            std = self.data["price"].rolling(self.SMA).std()
+            self.data["Lower"] = self.data["SMA"] - std * self.dev
+            self.data["Upper"] = self.data["SMA"] + std * self.dev
+            
+    def positions(self):
+        ''' Returns the positions and the complete rows (as arrays) of the prepared data.
+        '''
+        price, sma = self.data["price"].to_numpy(), self.data["SMA"].to_numpy()
+        valid = ~np.isnan(self.data.to_numpy(dtype = "float64")).any(axis = 1) # rows kept by dropna()
+        distance = np.where(valid, price - sma, np.nan)
+        position = np.where(price < self.data["Lower"].to_numpy(), 1, np.nan)
+        position = np.where(price > self.data["Upper"].to_numpy(), -1, position)
+        position[1:] = np.where(distance[1:] * distance[:-1] < 0, 0, position[1:])
+        return np.nan_to_num(ffill(position[:, None])[:, 0]), valid
+        
+    @memoized("SMA", "dev")
+    def test_strategy(self, metrics_only = False):
         ''' Backtests the trading strategy.
+
+        Parameters
+        ==========
+        metrics_only: boolean (default = False)
+            if True, perf, outperf and the number of trades are computed on NumPy arrays
+            (fast path for optimizations); results is not updated
         '''
+        if metrics_only:
+            position, valid = self.positions()
+            return performance(position, self.data["returns"].to_numpy(), valid, self.tc)
+        
         data = self.data.copy().dropna()
         data["distance"] = data.price - data.SMA
         data["position"] = np.where(data.price < data.Lower, 1, np.nan)
@@ -116,6 +177,128 @@ class MeanRevBacktester():
         
         return round(perf, 6), round(outperf, 6)
     
+    @classmethod
+    def test_many(cls, symbols, SMA, dev, start, end, tc):
+        ''' Backtests the Bollinger Bands-based trading strategy for several symbols in one vectorized pass.
+
+        Indicators, positions and returns are computed on the (bars x symbols) price matrix
+        (see BatchBacktest). Results are the same as test_strategy() per symbol.
+
+        Parameters
+        ==========
+        symbols: list
+            ticker symbols (columns of twenty_minutes.csv)
+        SMA, dev, start, end, tc:
+            see MeanRevBacktester
+
+        Returns
+        =======
+        summary: DataFrame
+            performance, outperformance, trades and number of bars per symbol
+        '''
+        prices = price_matrix("twenty_minutes.csv", symbols, start, end)
+        returns = np.log(prices / prices.shift(1))
+        sma = prices.rolling(SMA).mean()
+        std = prices.rolling(SMA).std()
+        lower, upper = sma - std * dev, sma + std * dev
+        distance = prices - sma
+        position = np.where(prices < lower, 1, np.nan)
+        position = np.where(prices > upper, -1, position)
+        position = np.where(distance * distance.shift(1) < 0, 0, position)
+        position = pd.DataFrame(position).ffill().fillna(0)
+        valid = returns.notna() & lower.notna() & upper.notna()
+        return summarize(position, returns, valid, tc)
+    
+    def tc_sweep(self, tc_values, spread = None):
+        ''' Performance curve as a function of the proportional costs per trade (one pass over the positions).
+
+        Parameters
+        ==========
+        tc_values: array-like
+            proportional costs per trade to be evaluated
+        spread: float or Series (optional)
+            additional costs per trade: constant or schedule over time (e.g. half spread / price)
+
+        Returns
+        =======
+        curve: DataFrame
+            performance, outperformance and trades per tc
+        break_even: float
+            tc at which the strategy breaks even (performance = 1)
+        '''
+        position, valid = self.positions()
+        returns = self.data["returns"].to_numpy()
+        gross, trades, kept = strategy_bars(position, returns, valid)
+        hold = np.exp(np.sum(returns[1:][kept]))
+        costs = bar_costs(spread, self.data.index)
+        return cost_curve(gross, trades, hold, tc_values, costs if np.isscalar(costs) else costs[1:])
+    
+    def test_spread_costs(self, spread):
+        ''' Backtests the strategy with bid-ask spread costs filled like in IterativeBase (vectorized, see ExecutionCosts).
+
+        Trades are executed at the ask/bid price of the trade bar and the full balance is
+        invested in every position (no proportional tc).
+
+        Parameters
+        ==========
+        spread: float or Series
+            absolute bid-ask spread: constant or per bar (e.g. the spread column of detailed.csv)
+
+        Returns
+        =======
+        perf, outperf: float
+            absolute performance and out-/underperformance of the strategy (rounded like test_strategy)
+        trades: int
+            number of trades (incl. closing the final position)
+        '''
+        position, valid = self.positions()
+        price = self.data["price"].to_numpy()
+        perf, trades = spread_performance(position, price, spread_array(spread, self.data.index), valid)
+        hold = price[valid][-1] / price[valid][0] # buy and hold over the same bars
+        return round(perf, 6), round(perf - hold, 6), trades
+    
+    def test_exits(self, sl_perc = None, tsl_perc = None, tp_perc = None):
+        ''' Backtests the strategy with stop loss, trailing stop loss and/or take profit exits (see ExitOverlay).
+
+        Parameters
+        ==========
+        sl_perc, tsl_perc, tp_perc: float (optional)
+            stop loss, trailing stop loss (distance) and take profit as fraction of the entry price
+
+        Returns
+        =======
+        perf, outperf: float
+            absolute performance and out-/underperformance of the strategy (rounded like test_strategy)
+        trades: float
+            number of trades (exits included)
+        '''
+        return tuple(self.optimize_exits([sl_perc], [tsl_perc], [tp_perc]).iloc[0, 3:].tolist())
+
+    def optimize_exits(self, sl_values = (None,), tsl_values = (None,), tp_values = (None,)):
+        ''' Backtests all combinations of stop loss, trailing stop loss and take profit levels.
+
+        The trades of the strategy are identified once (ExitOverlay); every combination only
+        applies its exits to the same position series.
+
+        Parameters
+        ==========
+        sl_values, tsl_values, tp_values: list or tuple
+            levels as fraction of the entry price (None: no such exit, default)
+
+        Returns
+        =======
+        overview: DataFrame
+            sl_perc, tsl_perc, tp_perc, performance, outperformance and trades per combination
+        '''
+        position, valid = self.positions()
+        returns = self.data["returns"].to_numpy()
+        overlay = ExitOverlay(np.where(valid, position, 0), self.data["price"])
+        combinations = list(product(sl_values, tsl_values, tp_values))
+        results = [performance(overlay.apply(*comb), returns, valid, self.tc) for comb in combinations]
+        overview = pd.DataFrame(combinations, columns = ["sl_perc", "tsl_perc", "tp_perc"])
+        overview[["performance", "outperformance", "trades"]] = results
+        return overview
+    
     def plot_results(self):
         ''' Plots the cumulative performance of the trading strategy
         compared to buy and hold.
@@ -126,24 +309,90 @@ class MeanRevBacktester():
             title = "{} | SMA = {} | dev = {} | TC = {}".format(self.symbol, self.SMA, self.dev, self.tc)
             self.results[["creturns", "cstrategy"]].plot(title=title, figsize=(12, 8))
         
-    def update_and_run(self, boll):
+    def update_and_run(self, boll, fraction = 1):
         ''' Updates parameters and returns the negative absolute performance (for minimazation algorithm).
 
         Parameters
         ==========
         Params: tuple
             parameter tuple with SMA and dist
+        fraction: float (default 1)
+            share of the data (first bars) to be backtested; the bands are only computed
+            on these bars (cached per window, see ParameterSearch.PrefixIndicators)
         '''
-        self.set_parameters(int(boll[0]), int(boll[1]))
-        return -self.test_strategy()[0]
+        if fraction >= 1:
+            self.set_parameters(int(boll[0]), int(boll[1]))
+            return -self.test_strategy(metrics_only = True)[0]
+        data, params = self.data, (self.SMA, self.dev)
+        bars = int(len(data) * fraction)
+        indicators = prefix_indicators(self)
+        self.SMA, self.dev = int(boll[0]), int(boll[1])
+        sma, std = indicators.get("mean", self.SMA, bars), indicators.get("std", self.SMA, bars)
+        self.data = data.iloc[:bars].assign(SMA = sma, Lower = sma - std * self.dev, Upper = sma + std * self.dev)
+        try:
+            return -self.test_strategy(metrics_only = True)[0]
+        except IndexError: # no complete bar in the slice
+            return np.inf
+        finally:
+            self.data = data # full data and parameters unchanged
+            self.SMA, self.dev = params
     
-    def optimize_parameters(self, SMA_range, dev_range):
+    def optimize_parameters(self, SMA_range, dev_range, vectorized = True, processes = 1, method = "brute", **search_kwargs):
         ''' Finds global maximum given the parameter ranges.
 
         Parameters
         ==========
         SMA_range, dist_range: tuple
             tuples of the form (start, end, step size)
+        vectorized: boolean (default = True)
+            whether the grid is scored at once (GridOptimizer.bollinger_grid) instead of
+            calling update_and_run for each grid point (scipy.optimize.brute)
+        processes: int (default 1)
+            number of worker processes scoring the vectorized grid (None: all cores, see ParallelOptimizer)
+        method: str (default "brute")
+            "brute" (full grid, see vectorized), "coarse_to_fine", "halving" (successive halving)
+            or "random" (random search), see ParameterSearch
+        search_kwargs:
+            options of the search method (e.g. factor, eta, rounds, budget, seed)
+        '''
+        if method != "brute":
+            opt = SEARCHES[method](self.update_and_run, (SMA_range, dev_range), **search_kwargs)
+        elif vectorized:
+            SMA, dev = np.mgrid[slice(*SMA_range)], np.mgrid[slice(*dev_range)] # same grid as brute
+            arrays = [self.data["price"], self.data["returns"]]
+            if processes == 1:
+                perf = bollinger_grid(*arrays, SMA.astype(int), dev.astype(int), self.tc)
+            else:
+                smas = rolling_means(self.data["price"], SMA.astype(int)) # computed once, shared with the workers
+                stds = rolling_stds(self.data["price"], SMA.astype(int))
+                perf = parallel_grid(bollinger_grid_bands, arrays + [smas, stds], SMA.astype(int), dev.astype(int),
+                                     self.tc, split = (2, 3), processes = processes)
+            perf = np.round(perf, 6)
+            i, j = np.unravel_index(np.argmax(perf), perf.shape)
+            opt = np.array([SMA[i], dev[j]], dtype = float)
+        else:
+            opt = brute(self.update_and_run, (SMA_range, dev_range), finish=None)
+        perf = -self.update_and_run(opt)
+        self.test_strategy() # results of the optimal parameters
+        return opt, perf
+
+    def walk_forward(self, SMA_range, dev_range, in_sample, out_sample):
+        ''' Walk-forward optimization: rolling in-sample optimization with out-of-sample tests (see WalkForward).
+
+        Parameters
+        ==========
+        SMA_range, dev_range: tuple
+            tuples of the form (start, end, step size)
+        in_sample, out_sample: int
+            number of bars of the in-sample and out-of-sample windows
+
+        Returns
+        =======
+        folds: DataFrame
+            windows, optimal parameters and in-/out-of-sample performance of each fold
+        results: DataFrame
+            stitched out-of-sample performance
         '''
-        opt = brute(self.update_and_run, (SMA_range, dev_range), finish=None)
-        return opt, -self.update_and_run(opt)
+        values1, values2 = np.mgrid[slice(*SMA_range)].astype(int), np.mgrid[slice(*dev_range)].astype(int)
+        return walk_forward(bollinger_net_returns, self.data["price"], self.data["returns"], values1, values2, in_sample, out_sample,
+                            self.tc, warmup = max(values1), names = ("SMA", "dev"))
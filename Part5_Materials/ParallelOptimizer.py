@@ -0,0 +1,130 @@
+import os
+import numpy as np
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+
+_shared = {} # per worker process: shared memory block and the (read-only) arrays in it
+
+
+def _attach(name, shape, layout):
+    ''' Pool initializer: maps the shared arrays (prices, returns, indicators) once per worker process.
+    '''
+    shm = SharedMemory(name = name)
+    block = np.ndarray(shape, dtype = "float64", buffer = shm.buf)
+    block.flags.writeable = False
+    _shared["shm"] = shm # keep the block open as long as the worker lives
+    _shared["arrays"] = [block[a:b].T if matrix else block[a] for a, b, matrix in layout]
+
+
+def _attach_object(obj):
+    ''' Pool initializer: keeps the object (e.g. a backtester with its data) once per worker process.
+    '''
+    _shared["object"] = obj
+
+
+def _call(task):
+    ''' Calls a method of the worker's object with one chunk of the work.
+    '''
+    method, part = task
+    return getattr(_shared["object"], method)(part)
+
+
+def _run(task):
+    ''' Scores one chunk of the grid on the shared arrays (only the chunk is sent to the worker).
+    '''
+    grid, values, columns, split, args = task
+    arrays = [array[:, columns] if i in split else array for i, array in enumerate(_shared["arrays"])]
+    return grid(*arrays, values, *args)
+
+
+def parallel_grid(grid, arrays, values, *args, split = (), processes = None, chunks = None):
+    ''' Runs a grid function (see GridOptimizer) in a process pool, splitting the first parameter.
+
+    The arrays (e.g. price and returns, and precomputed indicators like the SMAs of all
+    windows) are copied into shared memory once. Workers map them in the pool initializer,
+    so tasks only carry a chunk of parameter values and the dataset is never pickled or
+    copied per task. Indicator matrices with one column per value of the first parameter
+    (split) are sliced to the columns of the chunk. The chunk results are merged in order,
+    i.e. the result is the same as grid(*arrays, values, *args).
+
+    Parameters
+    ----------
+    grid: function
+        module-level grid function, e.g. sma_grid_means, bollinger_grid_bands or contrarian_grid
+    arrays: list
+        equally long arrays (bars) or matrices (bars x columns) passed (in this order) as the
+        first arguments of grid
+    values: array-like
+        values of the first parameter (split across the workers)
+    args:
+        further arguments of grid (same for all chunks)
+    split: tuple
+        positions (in arrays) of the matrices with one column per entry of values
+    processes: int (optional)
+        number of worker processes (default: all cores)
+    chunks: int (optional)
+        number of tasks (default: 4 per process, for load balancing)
+    '''
+    values = np.asarray(values)
+    processes = processes or os.cpu_count()
+    chunks = max(1, min(len(values), chunks or 4 * processes))
+    arrays = [np.asarray(array, dtype = "float64") for array in arrays]
+
+    # one block with a row per array / matrix column, i.e. every column is contiguous
+    layout, rows = [], 0
+    for array in arrays:
+        matrix = array.ndim == 2
+        width = array.shape[1] if matrix else 1
+        layout.append((rows, rows + width, matrix))
+        rows += width
+    shape = (rows, len(arrays[0]))
+
+    shm = SharedMemory(create = True, size = 8 * rows * shape[1])
+    block = None
+    try:
+        block = np.ndarray(shape, dtype = "float64", buffer = shm.buf)
+        for (a, b, matrix), array in zip(layout, arrays):
+            block[a:b] = array.T if matrix else array
+        bounds = np.linspace(0, len(values), chunks + 1).astype(int)
+        tasks = [(grid, values[a:b], slice(a, b), tuple(split), args) for a, b in zip(bounds[:-1], bounds[1:])]
+        with Pool(processes, initializer = _attach, initargs = (shm.name, shape, layout)) as pool:
+            results = pool.map(_run, tasks, chunksize = 1)
+    finally:
+        block = None # release the buffer before shm.close() (else BufferError hides any exception)
+        shm.close()
+        shm.unlink()
+
+    if isinstance(results[0], tuple): # e.g. contrarian_grid: (perf, trades)
+        return tuple(np.concatenate(parts) for parts in zip(*results))
+    return np.concatenate(results)
+
+
+def parallel_method(obj, method, items, processes = None, chunks = None):
+    ''' Calls obj.method(chunk) for chunks of items in a process pool and concatenates the returned lists.
+
+    obj (e.g. a backtester holding its dataset and precomputed indicators) is pickled once
+    per worker in the pool initializer; tasks only carry a chunk of items. The result is
+    the same as obj.method(list(items)), if method handles the items independently.
+
+    Parameters
+    ----------
+    obj: object
+        picklable object providing method
+    method: str
+        name of the method, called with a list of items and returning a list (one entry per item)
+    items: list
+        work items (e.g. parameter combinations)
+    processes: int (optional)
+        number of worker processes (default: all cores)
+    chunks: int (optional)
+        number of tasks (default: 4 per process, for load balancing)
+    '''
+    items = list(items)
+    processes = processes or os.cpu_count()
+    chunks = max(1, min(len(items), chunks or 4 * processes))
+    bounds = np.linspace(0, len(items), chunks + 1).astype(int)
+    tasks = [(method, items[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+    with Pool(processes, initializer = _attach_object, initargs = (obj,)) as pool:
+        results = pool.map(_call, tasks, chunksize = 1)
+    return [result for part in results for result in part]
@@ -0,0 +1,142 @@
+import numpy as np
+from itertools import product
+
+
+# Alternatives to scipy.optimize.brute(func, ranges, finish = None) on the same grid.
+# func is minimized (e.g. update_and_run: negative performance) and the best grid
+# point is returned as a float array, like brute does.
+
+
+def grid_axes(ranges):
+    ''' Returns the grid values per parameter (same grid as brute for (start, stop, step) ranges).
+    '''
+    return [np.mgrid[slice(*r)] for r in ranges]
+
+
+def evaluate(func, axes, indices, scores, *args):
+    ''' Evaluates func at the grid points given by indices (tuples), skipping points that are already scored.
+    '''
+    for index in indices:
+        if index not in scores:
+            scores[index] = func(np.array([axis[i] for axis, i in zip(axes, index)], dtype = float), *args)
+    return scores
+
+
+def best_point(axes, scores):
+    index = min(scores, key = scores.get)
+    return np.array([axis[i] for axis, i in zip(axes, index)], dtype = float)
+
+
+def coarse_to_fine(func, ranges, factor = 4):
+    ''' Scores every factor-th grid point per parameter first, then the full grid around the best coarse point.
+
+    Needs about (n1 / factor) * (n2 / factor) + (2 * factor - 1)**2 instead of n1 * n2 evaluations.
+
+    Parameters
+    ==========
+    func: function
+        function to be minimized, called with the parameter array
+    ranges: tuple
+        tuples of the form (start, end, step size)
+    factor: int
+        coarse grid step (in grid steps)
+    '''
+    axes = grid_axes(ranges)
+    coarse = [range(0, len(axis), factor) for axis in axes]
+    scores = evaluate(func, axes, product(*coarse), {})
+
+    best = min(scores, key = scores.get)
+    fine = [range(max(i - factor + 1, 0), min(i + factor, len(axis))) for axis, i in zip(axes, best)]
+    evaluate(func, axes, product(*fine), scores)
+    return best_point(axes, scores)
+
+
+def successive_halving(func, ranges, eta = 3, rounds = 3):
+    ''' Scores all grid points on a small slice of the data and keeps the best 1/eta for the next, eta times larger slice.
+
+    The data fractions are eta**-rounds, ..., 1/eta, 1 (the last round scores the
+    survivors on the full data). Every round scores 1/eta of the previous candidates on
+    eta times more bars, so each round processes about 1/eta**rounds of the bars brute
+    processes (with the defaults: n + n/3 + n/9 + n/27 evaluations, but only 4/27 of the
+    bars). This only pays off if func's costs scale with the fraction, i.e. indicators are
+    computed on the slice (see PrefixIndicators); fixed costs per call don't shrink.
+
+    Parameters
+    ==========
+    func: function
+        function to be minimized, called with the parameter array and the data fraction (0 < fraction <= 1)
+    ranges: tuple
+        tuples of the form (start, end, step size)
+    eta: int
+        reduction factor per round
+    rounds: int
+        number of rounds before the full data is used
+    '''
+    axes = grid_axes(ranges)
+    candidates = list(product(*[range(len(axis)) for axis in axes]))
+    for k in range(rounds, -1, -1):
+        scores = evaluate(func, axes, candidates, {}, float(eta)**-k)
+        if k > 0:
+            candidates = sorted(candidates, key = scores.get)[:int(np.ceil(len(candidates) / eta))]
+    return best_point(axes, scores)
+
+
+def random_search(func, ranges, budget = 100, seed = None):
+    ''' Scores a random sample of budget grid points (without replacement).
+
+    Parameters
+    ==========
+    func: function
+        function to be minimized, called with the parameter array
+    ranges: tuple
+        tuples of the form (start, end, step size)
+    budget: int
+        number of evaluations
+    seed: int (optional)
+        seed of the random number generator
+    '''
+    axes = grid_axes(ranges)
+    shape = [len(axis) for axis in axes]
+    size = int(np.prod(shape))
+    sample = np.random.default_rng(seed).choice(size, min(budget, size), replace = False)
+    indices = zip(*np.unravel_index(sample, shape))
+    scores = evaluate(func, axes, [tuple(int(i) for i in index) for index in indices], {})
+    return best_point(axes, scores)
+
+
+class PrefixIndicators():
+    ''' Rolling indicators of the first bars of a price series, cached per window (for successive halving).
+
+    Rolling windows only look back, so the indicator of a prefix is the beginning of the
+    indicator of any longer prefix. Every window is computed on the longest prefix requested
+    so far and sliced for shorter ones: candidates sharing a window reuse it within a round,
+    and rounds with more bars only extend it.
+    '''
+
+    def __init__(self, price):
+        self.price = price
+        self.cache = {}
+
+    def __repr__(self):
+        return "PrefixIndicators(bars = {}, cached = {})".format(len(self.price), len(self.cache))
+
+    def get(self, kind, window, bars):
+        ''' Returns the rolling kind ("mean" or "std") of window over the first bars prices.
+        '''
+        cached = self.cache.get((kind, window))
+        if cached is None or len(cached) < bars:
+            cached = self.cache[(kind, window)] = getattr(self.price.iloc[:bars].rolling(window), kind)()
+        return cached.iloc[:bars]
+
+
+def prefix_indicators(backtester):
+    ''' PrefixIndicators of the prices of a backtester (new cache per dataset, like ResultCache.data_hash).
+    '''
+    data = backtester.data
+    stamp = backtester.__dict__.get("_prefix_indicators")
+    if stamp is None or stamp[0] is not data:
+        stamp = backtester._prefix_indicators = (data, PrefixIndicators(data["price"]))
+    return stamp[1]
+
+
+SEARCHES = {"coarse_to_fine": coarse_to_fine, "halving": successive_halving, "random": random_search}
@@ -0,0 +1,136 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime, timedelta
+from BarStore import BarStore, complete_bars
+
+INSTRUMENT = "EUR_USD"
+BAR_LENGTH = "1min"
+ORIGIN = datetime(2026, 10, 12) # naive UTC (like in the traders)
+
+
+def s5_candles(days = 3, seed = 0):
+    ''' Synthetic S5 mid prices (close) with a tz-aware UTC index and some missing candles.
+    '''
+    index = pd.date_range(ORIGIN, periods = days * 24 * 720, freq = "5s", tz = "UTC")
+    rng = np.random.default_rng(seed)
+    close = 1.1 + np.cumsum(rng.normal(0, 1e-5, len(index)))
+    candles = pd.DataFrame({INSTRUMENT: close}, index = index)
+    return candles[rng.random(len(index)) > 0.1] # no candle if there was no price change
+
+
+class History():
+    ''' Stand-in for get_history: returns the candles between start and end and records every call.
+    '''
+
+    def __init__(self, candles):
+        self.candles = candles
+        self.calls = []
+
+    def __call__(self, start, end):
+        self.calls.append((start, end))
+        start, end = pd.Timestamp(start, tz = "UTC"), pd.Timestamp(end, tz = "UTC")
+        return self.candles.loc[(self.candles.index >= start) & (self.candles.index < end)]
+
+
+@pytest.fixture
+def history():
+    return History(s5_candles())
+
+
+def test_restart_only_fetches_the_tail(tmp_path, history):
+    store = BarStore(tmp_path, INSTRUMENT, BAR_LENGTH)
+    now = ORIGIN + timedelta(days = 1, seconds = 17)
+    store.update(history, now - timedelta(hours = 12), now)
+    last = store.last_bar()
+
+    later = now + timedelta(hours = 2)
+    store.update(history, later - timedelta(hours = 12), later)
+    assert len(history.calls) == 2
+    start, end = history.calls[1]
+    assert start == last.tz_convert(None).to_pydatetime() # tail since the last stored bar
+    assert end == later
+
+
+def test_no_fetch_without_missing_bar(tmp_path, history):
+    store = BarStore(tmp_path, INSTRUMENT, BAR_LENGTH)
+    now = ORIGIN + timedelta(days = 1, seconds = 17)
+    first = store.update(history, now - timedelta(hours = 12), now)
+
+    soon = now + timedelta(seconds = 20) # last stored bar ends at now - 17s -> next bar not complete
+    bars = store.update(history, soon - timedelta(hours = 12), soon)
+    assert len(history.calls) == 1
+    pd.testing.assert_frame_equal(bars, first.loc[pd.Timestamp(soon - timedelta(hours = 12), tz = "UTC"):],
+                                  check_freq = False, check_index_type = False, check_names = False)
+
+
+@pytest.mark.parametrize("hours", [1, 7, 30])
+def test_stored_and_fetched_equal_full_resample(tmp_path, history, hours):
+    store = BarStore(tmp_path, INSTRUMENT, BAR_LENGTH)
+    now = ORIGIN + timedelta(days = 1, seconds = 17)
+    store.update(history, now - timedelta(hours = 12), now)
+
+    later = now + timedelta(hours = hours, seconds = 31)
+    past = later - timedelta(hours = 12, seconds = 7)
+    bars = store.update(history, past, later)
+    full = complete_bars(history(past, later), BAR_LENGTH) # what get_most_recent fetched before the store
+
+    assert len(bars) == len(full)
+    assert (bars.index == full.index).all()
+    np.testing.assert_allclose(bars[INSTRUMENT].to_numpy(), full[INSTRUMENT].to_numpy(), rtol = 1e-12) # csv round trip
+    assert store.load().index.is_unique
+
+
+def test_trader_uses_the_store(tmp_path, monkeypatch):
+    pytest.importorskip("tpqoa")
+    import trader_oanda
+
+    now = pd.Timestamp.now(tz = "UTC").floor("1min")
+    candles = s5_candles(days = 3)
+    candles.index = candles.index + (now + pd.Timedelta(minutes = 5) - candles.index[-1]) # up to (after) now
+    history = History(candles)
+
+    def get_history(instrument, start, end, granularity, price, localize):
+        assert granularity == "S5" and price == "M"
+        return history(start, end).rename(columns = {INSTRUMENT: "c"})
+
+    trader = object.__new__(trader_oanda.ConTrader) # no config file / connection
+    trader.instrument = INSTRUMENT
+    trader.bar_length = pd.to_timedelta(BAR_LENGTH)
+    trader.bar_store = BarStore(tmp_path, INSTRUMENT, BAR_LENGTH)
+    monkeypatch.setattr(trader, "get_history", get_history, raising = False)
+    monkeypatch.setattr(trader_oanda.time, "sleep", lambda seconds: None)
+
+    trader.get_most_recent(days = 1)
+    assert history.calls[0][1] - history.calls[0][0] >= timedelta(days = 1)
+    calls = len(history.calls)
+    last = trader.bar_store.last_bar()
+    trader.get_most_recent(days = 1)
+    for start, end in history.calls[calls:]:
+        assert start >= last.tz_convert(None).to_pydatetime() # only the tail since the last stored bar
+    assert trader.raw_data.index[-1] == trader.bar_store.last_bar()
+
+
+def test_trader_store_is_opt_in(tmp_path, monkeypatch):
+    pytest.importorskip("tpqoa")
+    import inspect
+    import trader_oanda
+
+    assert inspect.signature(trader_oanda.ConTrader).parameters["store_dir"].default is None
+    monkeypatch.chdir(tmp_path)
+    now = pd.Timestamp.now(tz = "UTC").floor("1min")
+    candles = s5_candles(days = 2)
+    candles.index = candles.index + (now + pd.Timedelta(minutes = 5) - candles.index[-1])
+    history = History(candles)
+
+    trader = object.__new__(trader_oanda.ConTrader)
+    trader.instrument = INSTRUMENT
+    trader.bar_length = pd.to_timedelta(BAR_LENGTH)
+    trader.bar_store = None
+    monkeypatch.setattr(trader, "get_history", lambda instrument, start, end, granularity, price, localize:
+                        history(start, end).rename(columns = {INSTRUMENT: "c"}), raising = False)
+    monkeypatch.setattr(trader_oanda.time, "sleep", lambda seconds: None)
+    trader.get_most_recent(days = 1)
+    assert history.calls[-1][1] - history.calls[-1][0] == timedelta(days = 1) # full history, nothing stored
+    assert os.listdir(tmp_path) == []
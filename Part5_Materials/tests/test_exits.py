@@ -0,0 +1,26 @@
+import pytest
+from SMABacktester import SMABacktester
+from MeanRevBacktester import MeanRevBacktester
+
+TC = 0.00007
+
+
+@pytest.fixture(params = ["sma", "meanrev"])
+def tester(request):
+    if request.param == "sma":
+        return SMABacktester("EURUSD", 50, 200, "2018-01-01", "2019-12-31", TC)
+    return MeanRevBacktester("EURUSD", 30, 2, "2018-01-01", "2019-12-31", TC)
+
+
+def test_without_exits_equals_test_strategy(tester):
+    result = tester.test_exits()
+    assert isinstance(result, tuple) # like every test_* method
+    assert result == tuple(tester.test_strategy(metrics_only = True))
+
+
+def test_optimize_exits_matches_test_exits(tester):
+    overview = tester.optimize_exits(sl_values = (None, 0.002), tp_values = (None, 0.004))
+    assert len(overview) == 4
+    assert tuple(overview.iloc[0, 3:].tolist()) == tester.test_exits()
+    assert tuple(overview.iloc[3, 3:].tolist()) == tester.test_exits(sl_perc = 0.002, tp_perc = 0.004)
+    assert overview["trades"].iloc[3] >= overview["trades"].iloc[0] # exits add trades
@@ -0,0 +1,89 @@
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+from ParameterSearch import PrefixIndicators, successive_halving
+from SMABacktester import SMABacktester
+from MeanRevBacktester import MeanRevBacktester
+
+TC = 0.00007
+SETTING_WITH_COPY = getattr(pd.errors, "SettingWithCopyWarning", pd.errors.ChainedAssignmentError) # pandas < 3 / >= 3
+
+
+@pytest.fixture(scope = "module")
+def sma():
+    tester = SMABacktester("EURUSD", 50, 200, "2018-01-01", "2019-12-31", TC)
+    tester.preload()
+    return tester
+
+
+@pytest.fixture(scope = "module")
+def meanrev():
+    tester = MeanRevBacktester("EURUSD", 30, 2, "2018-01-01", "2019-12-31", TC)
+    tester.preload()
+    return tester
+
+
+def test_prefix_indicators_equal_rolling_on_the_prefix():
+    price = pd.Series(1.1 + np.cumsum(np.random.default_rng(0).normal(0, 1e-4, 2000)))
+    indicators = PrefixIndicators(price)
+    for bars in [100, 700, 2000, 300]: # growing and shrinking prefixes
+        for kind in ["mean", "std"]:
+            expected = getattr(price.iloc[:bars].rolling(20), kind)()
+            pd.testing.assert_series_equal(indicators.get(kind, 20, bars), expected)
+
+
+def full_data_score(tester, params, fraction):
+    ''' update_and_run before the prefix indicators: indicators on the full data, then sliced.
+    '''
+    tester.set_parameters(*params)
+    data = tester.data
+    tester.data = data.iloc[:int(len(data) * fraction)]
+    try:
+        return -tester.test_strategy(metrics_only = True)[0]
+    finally:
+        tester.data = data
+
+
+@pytest.mark.parametrize("fraction", [1 / 27, 1 / 9, 1 / 3])
+@pytest.mark.parametrize("params", [(25, 100), (41, 193), (49, 150)])
+def test_sma_prefix_scores(sma, params, fraction):
+    state = (sma.SMA_S, sma.SMA_L, sma.data)
+    score = sma.update_and_run(params, fraction)
+    assert (sma.SMA_S, sma.SMA_L, sma.data) == state # full data and parameters unchanged
+    assert score == full_data_score(sma, params, fraction)
+
+
+@pytest.mark.parametrize("fraction", [1 / 27, 1 / 9, 1 / 3])
+@pytest.mark.parametrize("params", [(25, 1), (58, 1), (99, 4)])
+def test_meanrev_prefix_scores(meanrev, params, fraction):
+    score = meanrev.update_and_run(params, fraction)
+    assert (meanrev.SMA, meanrev.dev) == (30, 2)
+    assert score == full_data_score(meanrev, params, fraction)
+    meanrev.set_parameters(30, 2)
+
+
+@pytest.mark.parametrize("tester, params", [("sma", (41, 193)), ("meanrev", (58, 1))])
+def test_prefix_scores_without_chained_assignment(request, tester, params):
+    tester = request.getfixturevalue(tester)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", SETTING_WITH_COPY)
+        for fraction in [1 / 27, 1 / 9, 1 / 3]:
+            tester.update_and_run(params, fraction)
+
+
+def test_halving_computes_indicators_on_prefixes(sma):
+    calls = []
+    rolling = pd.Series.rolling
+
+    def counted(self, window, *args, **kwargs):
+        calls.append(len(self))
+        return rolling(self, window, *args, **kwargs)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(pd.Series, "rolling", counted)
+        successive_halving(sma.update_and_run, ((25, 50, 1), (100, 200, 1)))
+    bars = len(sma.data)
+    cut = [n for n in calls if n < bars]
+    assert len(cut) <= 3 * (25 + 100) # every window at most once per data fraction
+    assert sum(calls) < 0.1 * 2 * 25 * 100 * bars # brute: two rolling windows over all bars per grid point
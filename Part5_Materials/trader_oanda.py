@@ -10,11 +10,13 @@ import numpy as np
 import tpqoa
 from datetime import datetime, timezone, timedelta # timezone added
 import time
+from BarStore import BarStore, complete_bars
 import warnings
 warnings.filterwarnings('ignore')
 
 class ConTrader(tpqoa.tpqoa):
-    def __init__(self, conf_file, instrument, bar_length, window, units, sl_perc = None, tsl_perc = None, tp_perc = None):
+    def __init__(self, conf_file, instrument, bar_length, window, units, sl_perc = None, tsl_perc = None, tp_perc = None,
+                 store_dir = None):
         super().__init__(conf_file)
         self.instrument = instrument
         self.bar_length = pd.to_timedelta(bar_length)
@@ -28,6 +30,8 @@ class ConTrader(tpqoa.tpqoa):
         self.sl_perc = sl_perc 
         self.tsl_perc = tsl_perc 
         self.tp_perc = tp_perc 
+        # optional local store of completed bars, e.g. store_dir = "bars" (None: always fetch the full history)
+        self.bar_store = BarStore(store_dir, instrument, self.bar_length) if store_dir else None
         
         #*****************add strategy-specific attributes here******************
         self.window = window
@@ -39,15 +43,25 @@ class ConTrader(tpqoa.tpqoa):
             now = datetime.now(timezone.utc).replace(tzinfo=None) # new (Python 3.12)
             now = now - timedelta(microseconds = now.microsecond)
             past = now - timedelta(days = days)
-            df = self.get_history(instrument = self.instrument, start = past, end = now,
-                                   granularity = "S5", price = "M", localize = False).c.dropna().to_frame()
-            df.rename(columns = {"c":self.instrument}, inplace = True)
-            df = df.resample(self.bar_length, label = "right").last().dropna().iloc[:-1]
+            
+            # stored bars: only fetch the missing tail since the last stored bar
+            if self.bar_store:
+                df = self.bar_store.update(self.fetch_history, past, now)
+            else:
+                df = complete_bars(self.fetch_history(past, now), self.bar_length)
             self.raw_data = df.copy()
             self.last_bar = self.raw_data.index[-1]
             if pd.to_datetime(datetime.now(timezone.utc)) - self.last_bar < self.bar_length:
                 break
             
+    def fetch_history(self, start, end):
+        ''' Returns the S5 mid prices (column instrument) between start and end.
+        '''
+        df = self.get_history(instrument = self.instrument, start = start, end = end,
+                               granularity = "S5", price = "M", localize = False).c.dropna().to_frame()
+        df.rename(columns = {"c":self.instrument}, inplace = True)
+        return df
+            
     def start_trading(self, days, max_attempts = 5, wait = 20, wait_increase = 0): # Error Handling
         attempt = 0
         success = False
@@ -102,8 +116,10 @@ class ConTrader(tpqoa.tpqoa):
             self.check_positions()
             
     def resample_and_join(self):
-        self.raw_data = pd.concat([self.raw_data, self.tick_data.resample(self.bar_length, 
-                                                                          label="right").last().ffill().iloc[:-1]])
+        new_bars = self.tick_data.resample(self.bar_length, label="right").last().ffill().iloc[:-1]
+        self.raw_data = pd.concat([self.raw_data, new_bars])
+        if self.bar_store:
+            self.bar_store.append(new_bars) # completed bars only
         self.tick_data = self.tick_data.iloc[-1:]
         self.last_bar = self.raw_data.index[-1]
         
@@ -226,7 +242,8 @@ if __name__ == "__main__":
         
     #insert the file path of your config file below!
     trader = ConTrader(r"C:\Users\hagma\Desktop\Algo_Trading_AZ\Part5_Materials\oanda.cfg",
-                       "EUR_USD", "1min", window = 1, units = 10000, sl_perc = 0.01, tp_perc = 0.01)
+                       "EUR_USD", "1min", window = 1, units = 10000, sl_perc = 0.01, tp_perc = 0.01,
+                       store_dir = "bars") # opt-in: restarts only fetch the bars missing in ./bars
     trader.start_trading(days = 5, max_attempts =  3, wait = 20, wait_increase = 0)
     
     
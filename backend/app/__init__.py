@@ -34,6 +34,10 @@ def create_app(config_name='default'):
     with app.app_context():
         db.create_all()
     
+    # Load backtest datasets once (shared by all requests of the process)
+    from .services.dataset_registry import dataset_registry
+    dataset_registry.preload(app.config['PRELOAD_DATASETS'])
+    
     @app.route('/')
     def index():
         return {'message': 'Algorithmic Trading Platform API', 'status': 'running'}, 200
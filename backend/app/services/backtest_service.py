@@ -10,6 +10,11 @@ from datetime import datetime
 # Add the Part5_Materials directory to the path to import backtester classes
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../..', 'Part5_Materials'))
 
+from .dataset_registry import dataset_registry
+
+# Price file shared by the Part5 backtesters
+DATASET = 'twenty_minutes.csv'
+
 class BacktestService:
     """Service for running backtests on trading strategies"""
     
@@ -50,7 +55,8 @@ class BacktestService:
             SMA_L=sma_l,
             start=start_date,
             end=end_date,
-            tc=transaction_cost
+            tc=transaction_cost,
+            raw_data=dataset_registry.view(DATASET, symbol, start_date, end_date)
         )
         
         performance, outperformance = backtester.test_strategy()
@@ -80,7 +86,8 @@ class BacktestService:
             dev=dev,
             start=start_date,
             end=end_date,
-            tc=transaction_cost
+            tc=transaction_cost,
+            raw_data=dataset_registry.view(DATASET, symbol, start_date, end_date)
         )
         
         performance, outperformance = backtester.test_strategy()
@@ -0,0 +1,87 @@
+"""
+Dataset Registry sharing historical price data between all backtests of a process
+"""
+import os
+import sys
+import logging
+import threading
+
+# Add the Part5_Materials directory to the path to import the data loading helpers
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..', 'Part5_Materials'))
+sys.path.insert(0, DATA_DIR)
+
+from PriceStore import PriceStore
+from DataCache import read_csv_window
+
+
+class StreamedDataset:
+    """
+    Dataset without on-disk cache (e.g. read-only data directory): every view
+    streams the csv file (like PriceStore.read_prices does in this case)
+    """
+
+    def __init__(self, filepath, index_col='time'):
+        self.filepath = filepath
+        self.index_col = index_col
+
+    def get(self, symbol, start=None, end=None):
+        return read_csv_window(self.filepath, symbol, start, end, self.index_col)
+
+
+class DatasetRegistry:
+    """
+    Process-wide registry opening each dataset at most once
+
+    Datasets are memory-mapped per symbol (PriceStore), so all workers share
+    the same OS page cache and memory does not grow with request concurrency.
+    """
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        self._datasets = {}
+        self._lock = threading.Lock()
+
+    def get(self, filename, index_col='time'):
+        """
+        Return the dataset for filename, opening it on first use
+
+        Falls back to a StreamedDataset if the cache can't be built (e.g. the
+        data directory is read-only), so that preloading never stops the app
+        """
+        dataset = self._datasets.get(filename)
+        if dataset is None:
+            with self._lock:
+                dataset = self._datasets.get(filename)
+                if dataset is None:
+                    path = os.path.join(self.data_dir, filename)
+                    try:
+                        dataset = PriceStore(path, index_col=index_col)
+                    except OSError as e:
+                        if not os.path.isfile(path):
+                            raise
+                        logging.warning(f'No price cache for {filename} ({e}), streaming the csv file instead')
+                        dataset = StreamedDataset(path, index_col=index_col)
+                    self._datasets[filename] = dataset
+        return dataset
+
+    def view(self, filename, symbol, start=None, end=None):
+        """Return the prices (column 'price') of symbol between start and end"""
+        return self.get(filename).get(symbol, start, end)
+
+    def preload(self, filenames):
+        """
+        Open datasets up front (building their on-disk caches if required)
+
+        Called from the app factory so that gunicorn (with --preload) does this
+        once in the master process and all workers share it after the fork.
+        """
+        for filename in filenames:
+            self.get(filename)
+
+    def clear(self):
+        """Drop all loaded datasets"""
+        with self._lock:
+            self._datasets.clear()
+
+
+dataset_registry = DatasetRegistry()
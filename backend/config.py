@@ -57,6 +57,9 @@ class Config:
     
     # CORS Configuration
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:3000').split(',')
+    
+    # Backtest datasets loaded once per process (before the fork with gunicorn --preload)
+    PRELOAD_DATASETS = ['twenty_minutes.csv']
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -83,6 +86,7 @@ class TestingConfig(Config):
     DEBUG = True
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///test_trading.db'
+    PRELOAD_DATASETS = []
 
 config = {
     'development': DevelopmentConfig,
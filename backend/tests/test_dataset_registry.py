@@ -0,0 +1,51 @@
+import os
+import importlib.util
+import pandas as pd
+import pytest
+
+SERVICES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app', 'services')
+CSV = os.path.join(os.path.dirname(SERVICES), '..', '..', 'Part5_Materials', 'twenty_minutes.csv')
+
+
+def load_registry_module():
+    """Import dataset_registry.py directly (the app package itself needs flask and a database)"""
+    spec = importlib.util.spec_from_file_location('dataset_registry', os.path.join(SERVICES, 'dataset_registry.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    with open(CSV) as source, open(tmp_path / 'prices.csv', 'w') as target:
+        target.writelines(line for _, line in zip(range(2000), source))
+    return tmp_path
+
+
+def test_preload_builds_the_cache(data_dir):
+    registry = load_registry_module().DatasetRegistry(str(data_dir))
+    registry.preload(['prices.csv'])
+    assert type(registry.get('prices.csv')).__name__ == 'PriceStore'
+    assert os.path.isdir(data_dir / '__datacache__')
+
+
+def test_preload_without_writable_cache(data_dir):
+    # a file where the cache directory should go: the cache can't be written (like a
+    # read-only data directory, which can't be simulated with permissions when running as root)
+    (data_dir / '__datacache__').write_text('')
+    module = load_registry_module()
+    registry = module.DatasetRegistry(str(data_dir))
+    registry.preload(['prices.csv']) # must not raise (app startup)
+    assert isinstance(registry.get('prices.csv'), module.StreamedDataset)
+
+    view = registry.view('prices.csv', 'EURUSD', '2019-01-03', '2019-01-05')
+    prices = pd.read_csv(data_dir / 'prices.csv', parse_dates=['time'], index_col='time')['EURUSD']
+    expected = prices.loc['2019-01-03':'2019-01-05'].dropna()
+    assert len(view) == len(expected) > 0
+    assert (view['price'].to_numpy() == expected.to_numpy()).all()
+
+
+def test_missing_file_still_fails(data_dir):
+    registry = load_registry_module().DatasetRegistry(str(data_dir))
+    with pytest.raises(OSError):
+        registry.preload(['missing.csv'])